@@ -1,7 +1,24 @@
+import os
+import sys
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+# Shared helpers live next to the other pages in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from aggregates import build_cube, rollup
+from columnar_store import load_or_ingest, read_dataset
+from data_cache import dataset_cache, dataset_key, uploaded_file_key
+from date_parsing import parse_dates
+from joins import join_supplementary
+from memory_optimizer import optimize_memory, summarize_report
+from multi_ingest import file_summary, ingest_many
+from rendering import bar_chart, histogram_chart, scatter_chart, show_line_chart
+from rolling_stats import sales_trend
+from schema_registry import resolve_roles
+from streaming import profile_csv, read_header
+
 # Custom CSS to style the app consistently
 st.markdown("""
     <style>
@@ -55,29 +72,153 @@ st.markdown("""
 # File upload
 uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
 
+# Alternative names for the columns this page needs; the match is remembered per CSV header
+ORDER_COLUMNS = {
+    'amount': ['Amount', 'Sales', 'sale', 'cost'],
+    'qty': ['Qty', 'Quantity', 'quantity'],
+    'cost': ['Cost', 'Unit Cost', 'Price'],
+    'date': ['Date', 'date', 'Order Date'],
+}
+
 # Function to check for common alternative column names
-def get_column_name(df, alternatives):
-    for col in alternatives:
-        if col in df.columns:
-            return col
-    return None
+def get_column_names(df):
+    roles = resolve_roles(df.columns, ORDER_COLUMNS)
+    return roles['amount'], roles['qty'], roles['cost'], roles['date']
+
+# Compute every Sales/Profit aggregate in one go so reruns only redraw charts
+def compute_sales_analysis(df, amount_col, qty_col, cost_col, date_col):
+    df = df.copy()
+    result = {}
+
+    # Create a new column for profit per order
+    total_cost = df[qty_col] * df[cost_col]
+    df['Profit'] = df[amount_col] - total_cost
+
+    # Convert 'Date' column to datetime format
+    df[date_col] = parse_dates(df[date_col])
+
+    # Single scan into a Date x Category x Region cube; the charts below are rollups of it
+    cube = build_cube(df, [date_col, 'Category', 'ship_state'],
+                      {amount_col: amount_col, 'Profit': 'Profit', qty_col: qty_col, 'Total_Cost': total_cost})
+    result['cube'] = cube
+
+    # Moving Average for Sales
+    sales_time_series = sales_trend(rollup(cube, date_col, [amount_col]), date_col, amount_col)
+    sales_time_series['Moving_Avg'] = sales_time_series['MA_7']
+    result['sales_time_series'] = sales_time_series
+    result['frame'] = df
+    return result
+
+# Streaming variant of the analysis below: sums are accumulated chunk by chunk so memory stays bounded
+def show_streaming_analysis(source, dataset_id):
+    header = read_header(source, encoding='ISO-8859-1')
+    amount_col, qty_col, cost_col, date_col = get_column_names(header)
+    if not (amount_col and qty_col and cost_col and date_col):
+        st.warning("Streaming mode needs Amount, Qty, Cost and Date columns.")
+        return
+
+    def prepare_chunk(chunk):
+        chunk['Total_Cost'] = pd.to_numeric(chunk[qty_col], errors='coerce') * pd.to_numeric(chunk[cost_col], errors='coerce')
+        chunk['Profit'] = chunk[amount_col] - chunk['Total_Cost']
+        return chunk
+
+    group_columns = [col for col in ['Category', 'ship_state'] if col in header.columns]
+    profile = dataset_cache.get_or_compute(
+        dataset_id, 'streamed_profile',
+        lambda: profile_csv(source, date_column=date_col, value_columns=[amount_col, 'Profit', 'Total_Cost'],
+                            group_columns=group_columns, encoding='ISO-8859-1',
+                            fill_missing_groups=False, prepare_chunk=prepare_chunk, drop_duplicates=False))
+
+    st.write(f"Streamed {profile['rows']:,} rows ({profile['duplicates']:,} duplicates)")
+    st.write("### Data Preview")
+    st.dataframe(profile['head'])
+
+    st.title('Sales and Profit Analysis')
+    by_date = profile['sums_by_date']
+    by_group = profile['sums_by_group']
+
+    st.subheader('Profit Analysis Over Time')
+    st.plotly_chart(px.line(by_date, x=date_col, y='Profit', title='Profit Analysis Over Time', labels={date_col: 'Date', 'Profit': 'Total Profit'}))
+
+    st.subheader('Total Sales Over Time')
+    st.plotly_chart(px.line(by_date, x=date_col, y=amount_col, title='Total Sales Over Time', labels={date_col: 'Date', amount_col: 'Total Sales'}))
+
+    if 'Category' in by_group:
+        st.subheader('Sales by Category')
+        st.plotly_chart(px.bar(by_group['Category'], x='Category', y=amount_col, title='Sales by Category'))
+
+    if 'ship_state' in by_group:
+        st.subheader('Sales Performance by Region')
+        st.plotly_chart(px.bar(by_group['ship_state'], x='ship_state', y=amount_col, title='Sales Performance by Region'))
+
+    if 'Category' in by_group:
+        st.subheader('Profit by Category')
+        st.plotly_chart(px.bar(by_group['Category'], x='Category', y='Profit', title='Profit by Category'))
+
+    st.subheader('Sales Trends with Moving Average')
+    trend = sales_trend(by_date, date_col, amount_col)
+    trend['Moving_Avg'] = trend['MA_7']
+    st.plotly_chart(px.line(trend, x=date_col, y=[amount_col, 'Moving_Avg'], title='Sales Trends with Moving Average', labels={date_col: 'Date', 'value': 'Sales'}))
+
+    total_sales = profile['totals'][amount_col]
+    total_cost = profile['totals']['Total_Cost']
+    profit = total_sales - total_cost
+    profit_percentage = (profit / total_sales) * 100 if total_sales != 0 else 0
+    st.markdown(
+        """
+        <div class="card" style='width: 80%; margin: 0 auto;'>
+            <h2 style='font-size: 50px;'>Profit/Loss Analysis</h2>
+            <p style='font-size: 40px; font-style: italic;'>Total Sales: <strong>${:,.2f}</strong></p>
+            <p style='font-size: 40px; font-style: italic;'>Total Cost: <strong>${:,.2f}</strong></p>
+            <p style='font-size: 40px; font-style: italic;'>Profit: <strong>${:,.2f}</strong></p>
+            <p style='font-size: 40px; font-style: italic;'>Profit Percentage: <strong>{:.2f}%</strong></p>
+        </div>
+        """.format(total_sales, total_cost, profit, profit_percentage),
+        unsafe_allow_html=True
+    )
+
+# Streaming mode for files too large to load into memory at once
+streaming_mode = st.checkbox("Streaming mode (bounded memory for very large files)")
+server_path = st.text_input("Or path to a CSV file on the server") if streaming_mode else ''
+
+# Several files (e.g. one per store) are parsed concurrently and analyzed as one dataset
+uploaded_files = []
+if not streaming_mode and st.checkbox("Combine several files (one CSV per store or region)"):
+    uploaded_files = st.file_uploader("Upload the CSV files", type=["csv"], accept_multiple_files=True)
+
+if streaming_mode and (server_path or uploaded_file is not None):
+    try:
+        if server_path:
+            stat = os.stat(server_path)
+            show_streaming_analysis(server_path, dataset_key(f"{server_path}:{stat.st_size}:{stat.st_mtime_ns}".encode()))
+        else:
+            show_streaming_analysis(uploaded_file, uploaded_file_key(uploaded_file))
+    except Exception as e:
+        st.error(f"Error reading the file: {e}")
 
-if uploaded_file is not None:
+elif uploaded_files or uploaded_file is not None:
     try:
-        # Read the CSV file
+        # Read the CSV file (cached by content hash and persisted as Parquet, so reruns and reloads skip the parse)
         try:
-            df = pd.read_csv(uploaded_file, encoding='utf-8')
-        except UnicodeDecodeError:
-            try:
-                df = pd.read_csv(uploaded_file, encoding='ISO-8859-1')
-            except Exception as e:
-                st.error(f"Error reading the file: {e}")
+            if uploaded_files:
+                dataset_id = ingest_many(uploaded_files)
+                df = dataset_cache.get_or_compute(dataset_id, 'raw', lambda: read_dataset(dataset_id))
+                st.write(f"Combined {len(uploaded_files)} files")
+                st.dataframe(dataset_cache.get_or_compute(dataset_id, 'file_summary', lambda: file_summary(df)))
+            else:
+                dataset_id = uploaded_file_key(uploaded_file)
+                df = dataset_cache.get_or_compute(dataset_id, 'raw', lambda: load_or_ingest(uploaded_file, encodings=('utf-8', 'ISO-8859-1')))
+        except Exception as e:
+            st.error(f"Error reading the file: {e}")
+
+        # Optional memory optimization right after ingestion
+        memory_report = None
+        if st.checkbox("Optimize memory footprint (downcast numbers, categorize repeated strings)"):
+            df, memory_report = dataset_cache.get_or_compute(dataset_id, 'optimized', lambda: optimize_memory(df))
+            dataset_id = f"{dataset_id}:optimized"
 
         # Identify required columns with alternative names
-        amount_col = get_column_name(df, ['Amount', 'Sales', 'sale', 'cost'])
-        qty_col = get_column_name(df, ['Qty', 'Quantity', 'quantity'])
-        cost_col = get_column_name(df, ['Cost', 'Unit Cost', 'Price'])
-        date_col = get_column_name(df, ['Date', 'date', 'Order Date'])
+        amount_col, qty_col, cost_col, date_col = get_column_names(df)
 
         # Inform user if certain columns are missing
         missing_columns = []
@@ -97,18 +238,39 @@ if uploaded_file is not None:
         if not qty_col and not cost_col:
             st.error("Both 'Qty' and 'Cost' columns are missing, which limits profit analysis.")
             add_data = st.file_uploader("Upload an additional CSV file containing Qty and Cost information (optional)", type=["csv"])
+            add_path = st.text_input("Or path to the supplementary CSV on the server (for very large cost tables)")
 
-            if add_data:
+            if add_data or add_path:
                 try:
-                    extra_df = pd.read_csv(add_data)
-                    # Add missing columns from supplementary data
-                    if 'Qty' in extra_df.columns and qty_col is None:
-                        df['Qty'] = extra_df['Qty']
-                        qty_col = 'Qty'
-                    if 'Cost' in extra_df.columns and cost_col is None:
-                        df['Cost'] = extra_df['Cost']
-                        cost_col = 'Cost'
-                    st.success("Supplementary data added successfully!")
+                    if add_path:
+                        stat = os.stat(add_path)
+                        add_source, extra_id = add_path, dataset_key(f"{add_path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+                    else:
+                        add_source, extra_id = add_data, uploaded_file_key(add_data)
+                    extra_header = read_header(add_source, encoding='ISO-8859-1')
+                    # Rows are matched by key (e.g. Order_ID, or SKU and Date), never by position
+                    common = [col for col in df.columns if col in extra_header.columns and col not in ('Qty', 'Cost')]
+                    join_keys = st.multiselect("Match rows on", common, default=[col for col in ['Order_ID'] if col in common])
+                    wanted = [col for col in ['Qty', 'Cost'] if col in extra_header.columns]
+                    if not join_keys:
+                        st.warning("Choose the column(s) identifying a row in both files to add the supplementary data.")
+                    elif wanted:
+                        df, join_report = dataset_cache.get_or_compute(
+                            dataset_id, ('joined', extra_id, tuple(join_keys)),
+                            lambda: join_supplementary(df, add_source, join_keys, wanted, encoding='ISO-8859-1'))
+                        dataset_id = f"{dataset_id}+{extra_id}:{','.join(join_keys)}"
+                        qty_col = 'Qty' if 'Qty' in wanted else qty_col
+                        cost_col = 'Cost' if 'Cost' in wanted else cost_col
+                        st.success(f"Supplementary data added: {join_report['rows_matched']:,} of {join_report['rows']:,} rows matched.")
+                        if join_report['rows_unmatched']:
+                            st.warning(f"{join_report['rows_unmatched']:,} rows have no supplementary match, e.g.:")
+                            st.dataframe(pd.DataFrame(join_report['unmatched_main_keys']))
+                        if join_report['supplementary_unmatched']:
+                            st.info(f"{join_report['supplementary_unmatched']:,} of {join_report['supplementary_rows']:,} "
+                                    "supplementary rows match no row of the main file, e.g.:")
+                            st.dataframe(pd.DataFrame(join_report['unmatched_supplementary_keys']))
+                    else:
+                        st.warning("The supplementary file has neither a 'Qty' nor a 'Cost' column.")
                 except Exception as e:
                     st.error(f"Failed to load supplementary data: {e}")
 
@@ -121,14 +283,23 @@ if uploaded_file is not None:
             st.write("### Data Preview")
             st.dataframe(df.head())
 
+            if memory_report is not None:
+                st.write("### Memory Footprint")
+                st.dataframe(memory_report)
+                st.write(summarize_report(memory_report))
+
             st.title('Sales and Profit Analysis')
 
             if amount_col and qty_col and cost_col:
-                # Calculate total sales
-                total_sales = df[amount_col].sum()
+                analysis = dataset_cache.get_or_compute(
+                    dataset_id, ('sales_analysis', amount_col, qty_col, cost_col, date_col),
+                    lambda: compute_sales_analysis(df, amount_col, qty_col, cost_col, date_col))
+                cube = analysis['cube']
 
-                # Calculate total cost
-                total_cost = (df[qty_col] * df[cost_col]).sum()
+                # Calculate total sales and total cost
+                totals = rollup(cube)
+                total_sales = totals[amount_col]
+                total_cost = totals['Total_Cost']
 
                 # Calculate profit
                 profit = total_sales - total_cost
@@ -136,55 +307,42 @@ if uploaded_file is not None:
                 # Calculate profit percentage
                 profit_percentage = (profit / total_sales) * 100 if total_sales != 0 else 0
 
-                # Create a new column for profit per order
-                df['Profit'] = df[amount_col] - (df[qty_col] * df[cost_col])
-
-                # Convert 'Date' column to datetime format
-                df[date_col] = pd.to_datetime(df[date_col])
-
-                # Group by date and sum profits for time-series analysis
-                profit_time_series = df.groupby(date_col)['Profit'].sum().reset_index()
-
                 # Line graph for profit analysis over time
                 st.subheader('Profit Analysis Over Time')
-                profit_fig = px.line(profit_time_series, x=date_col, y='Profit', title='Profit Analysis Over Time', labels={date_col: 'Date', 'Profit': 'Total Profit'})
+                profit_fig = px.line(rollup(cube, date_col, ['Profit']), x=date_col, y='Profit', title='Profit Analysis Over Time', labels={date_col: 'Date', 'Profit': 'Total Profit'})
                 st.plotly_chart(profit_fig)
 
                 # Total Sales Over Time
                 st.subheader('Total Sales Over Time')
-                sales_time_series = df.groupby(date_col)[amount_col].sum().reset_index()
+                sales_time_series = analysis['sales_time_series']
                 sales_fig = px.line(sales_time_series, x=date_col, y=amount_col, title='Total Sales Over Time', labels={date_col: 'Date', amount_col: 'Total Sales'})
                 st.plotly_chart(sales_fig)
 
                 # Sales by Category
                 if 'Category' in df.columns:
                     st.subheader('Sales by Category')
-                    sales_by_category = df.groupby('Category')[amount_col].sum().reset_index()
-                    category_fig = px.bar(sales_by_category, x='Category', y=amount_col, title='Sales by Category')
+                    category_fig = px.bar(rollup(cube, 'Category', [amount_col]), x='Category', y=amount_col, title='Sales by Category')
                     st.plotly_chart(category_fig)
 
                 # Sales Quantity Distribution
                 st.subheader('Distribution of Sales Quantities')
-                quantity_fig = px.histogram(df, x=qty_col, title='Distribution of Sales Quantities')
+                quantity_fig = histogram_chart(analysis['frame'], x=qty_col, title='Distribution of Sales Quantities')
                 st.plotly_chart(quantity_fig)
 
                 # Sales Performance by Region
                 if 'ship_state' in df.columns:
                     st.subheader('Sales Performance by Region')
-                    sales_by_region = df.groupby('ship_state')[amount_col].sum().reset_index()
-                    region_fig = px.bar(sales_by_region, x='ship_state', y=amount_col, title='Sales Performance by Region')
+                    region_fig = px.bar(rollup(cube, 'ship_state', [amount_col]), x='ship_state', y=amount_col, title='Sales Performance by Region')
                     st.plotly_chart(region_fig)
 
                 # Profit by Category
                 if 'Category' in df.columns:
                     st.subheader('Profit by Category')
-                    profit_by_category = df.groupby('Category')['Profit'].sum().reset_index()
-                    profit_category_fig = px.bar(profit_by_category, x='Category', y='Profit', title='Profit by Category')
+                    profit_category_fig = px.bar(rollup(cube, 'Category', ['Profit']), x='Category', y='Profit', title='Profit by Category')
                     st.plotly_chart(profit_category_fig)
 
                 # Moving Average for Sales
                 st.subheader('Sales Trends with Moving Average')
-                sales_time_series['Moving_Avg'] = sales_time_series[amount_col].rolling(window=7).mean()
                 moving_avg_fig = px.line(sales_time_series, x=date_col, y=[amount_col, 'Moving_Avg'], title='Sales Trends with Moving Average', labels={date_col: 'Date', 'value': 'Sales'})
                 st.plotly_chart(moving_avg_fig)
 
@@ -217,17 +375,18 @@ if uploaded_file is not None:
             st.write("### Select a chart type")
             chart_type = st.selectbox("Select chart type", ['Bar', 'Line', 'Scatter', 'Histogram'])
 
-            # Generate chart based on selected type
-            if chart_type == 'Bar':
-                fig = px.bar(df, x=col1, y=col2, title=f'{col1} vs {col2}')
-            elif chart_type == 'Line':
-                fig = px.line(df, x=col1, y=col2, title=f'{col1} vs {col2}')
-            elif chart_type == 'Scatter':
-                fig = px.scatter(df, x=col1, y=col2, title=f'{col1} vs {col2}')
+            # Generate chart based on selected type (large frames are aggregated, downsampled or drawn with WebGL)
+            if chart_type == 'Line':
+                show_line_chart(df, x=col1, y=col2, key='custom_line_zoom', title=f'{col1} vs {col2}')
             else:
-                fig = px.histogram(df, x=col1, title=f'{col1} Distribution')
-
-            st.plotly_chart(fig)
+                if chart_type == 'Bar':
+                    fig = bar_chart(df, x=col1, y=col2, title=f'{col1} vs {col2}')
+                elif chart_type == 'Scatter':
+                    fig = scatter_chart(df, x=col1, y=col2, title=f'{col1} vs {col2}')
+                else:
+                    fig = histogram_chart(df, x=col1, title=f'{col1} Distribution')
+
+                st.plotly_chart(fig)
 
     except Exception as e:
         st.error(f"Error reading the file: {e}")
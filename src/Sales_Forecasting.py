@@ -1,8 +1,16 @@
+import time
+
 import streamlit as st
-import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
-from statsmodels.tsa.statespace.sarimax import SARIMAX  # Use SARIMA for seasonality
+from column_roles import segment_columns
+from columnar_store import ingest, read_columns, read_dataset
+from data_cache import dataset_cache, uploaded_file_key
+from diagnostics import show_diagnostics, stage, start_run
+from forecasting import ORDER, SEASONAL_ORDER, backtest, forecast_index, forecast_segments, preprocess_sales, search_orders
+from model_cache import load_or_fit  # SARIMA for seasonality, fitted once per data/spec
+from multi_ingest import SOURCE_COLUMN, ingest_many
+
 st.markdown(
     """
     <style>
@@ -14,76 +22,167 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-def main():
+def show_segment_forecasts(dataset_id, content_key, segment_options, num_months):
+    """
+    Forecasts every value of the chosen segment column and shows the combined table,
+    the per-segment status and a chart for one selected segment.
+    """
+    segment_column = st.selectbox("Segment column", segment_options)
+    df = dataset_cache.get_or_compute(dataset_id, ('forecast_segment_columns', segment_column),
+                                      lambda: read_dataset(content_key, ['Date', 'Sales', segment_column]))
+
+    progress_bar = st.progress(0.0)
+
+    def report(done, total):
+        progress_bar.progress(done / total, text=f"Forecasted {done:,} of {total:,} segments")
+
+    start = time.perf_counter()
+    with stage('segment forecasts'):
+        forecasts, summary = dataset_cache.get_or_compute(
+            dataset_id, ('segment_forecasts', segment_column, num_months),
+            lambda: forecast_segments(df, segment_column, num_months, progress=report))
+    progress_bar.empty()
+
+    failed = summary[summary['Status'] != 'ok']
+    st.caption(f"{len(summary) - len(failed):,} of {len(summary):,} segments forecasted "
+               f"in {time.perf_counter() - start:.1f} s")
+    if not failed.empty:
+        st.warning(f"{len(failed):,} segments could not be forecasted; see the status table below.")
+
+    st.subheader("Forecasts")
+    st.dataframe(forecasts)
+    st.download_button("Download forecasts (CSV)", forecasts.to_csv(index=False), file_name="segment_forecasts.csv")
+
+    with st.expander("Segment status"):
+        st.dataframe(summary)
+
+    if not forecasts.empty:
+        segment = st.selectbox("Show segment", forecasts['Segment'].unique())
+        shown = forecasts[forecasts['Segment'] == segment]
+        fig = go.Figure(go.Scatter(x=shown['Date'], y=shown['Forecast'], mode='lines+markers',
+                                   name='Forecasted Sales', line=dict(color='red')))
+        fig.update_layout(title=f"Forecast for {segment}", xaxis_title="Date", yaxis_title="Sales")
+        st.plotly_chart(fig)
+
+def show_backtest(dataset_id, series, order, seasonal_order):
+    """
+    Runs (or reuses) a rolling-origin backtest of the specification and shows its errors
+    per horizon and per cutoff, with fit and forecast times.
+    """
+    horizon = st.number_input("Backtest horizon (periods):", min_value=1, value=3)
+    n_cutoffs = st.number_input("Number of cutoffs:", min_value=1, value=12)
+    try:
+        with stage('backtest'):
+            per_cutoff, by_horizon, summary = dataset_cache.get_or_compute(
+                dataset_id, ('backtest', order, seasonal_order, horizon, n_cutoffs),
+                lambda: backtest(series, order, seasonal_order, horizon=horizon, n_cutoffs=n_cutoffs))
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    st.subheader(f"Backtest of SARIMA{order}x{seasonal_order}")
+    st.write(f"MAPE {summary['MAPE']:.1f}% | sMAPE {summary['sMAPE']:.1f}% | RMSE {summary['RMSE']:,.2f}")
+    st.caption(f"{summary['cutoffs']} cutoffs in {summary['wall_seconds']:.1f} s "
+               f"(fitting {summary['fit_seconds']:.1f} s, forecasting {summary['forecast_seconds']:.2f} s of worker time)")
+    st.dataframe(by_horizon)
+    with st.expander("Errors per cutoff"):
+        st.dataframe(per_cutoff)
+
+def forecast_page(diagnostics):
     st.title("Sales Forecasting")
 
-    # File upload
+    # File upload (or several files, e.g. one per store, parsed concurrently and combined)
     file = st.file_uploader("Upload Sales Data (CSV)", type='csv')
+    files = []
+    if st.checkbox("Combine several files (one CSV per store or region)"):
+        files = st.file_uploader("Upload the CSV files", type='csv', accept_multiple_files=True)
 
     # Input for number of months to forecast
     num_months = st.number_input("Number of months to forecast:", min_value=1, value=1)
 
-    if file:
-        df = pd.read_csv(file, encoding='latin1')  # Adjust encoding as needed
+    if files or file:
+        with stage('ingestion'):
+            if files:
+                content_key = dataset_id = ingest_many(files)
+            else:
+                dataset_id = uploaded_file_key(file, encoding='latin1')
+                content_key = ingest(file, encodings=('latin1',))  # Adjust encoding as needed
+        diagnostics.context['dataset'] = dataset_id
 
         # Ensure the dataset has the required columns
-        if 'Date' not in df.columns or 'Sales' not in df.columns:
+        columns = read_columns(content_key)
+        if 'Date' not in columns or 'Sales' not in columns:
             st.error('Dataset must contain "Date" and "Sales" columns')
             return
 
-        # Preprocessing
-        # Try parsing dates with different formats
-        try:
-            df['Date'] = pd.to_datetime(df['Date'], format='%m/%d/%Y', errors='coerce').fillna(
-                pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce'))
-        except Exception as e:
-            st.error(f'Error parsing dates: {e}')
+        # Batch mode: one model per store/region/category, fitted on a process pool
+        segment_options = segment_columns(columns) + [col for col in [SOURCE_COLUMN] if col in columns]
+        if segment_options and st.checkbox("Forecast each segment separately"):
+            show_segment_forecasts(dataset_id, content_key, segment_options, num_months)
             return
 
-        # Drop rows where Date parsing failed
-        df.dropna(subset=['Date'], inplace=True)
-        df.set_index('Date', inplace=True)
-        df = df.sort_index()
-
-        # Remove duplicates and resample to monthly totals if spanning years
-        df = df.groupby(df.index).sum()
-        if (df.index[-1] - df.index[0]).days > 365:
-            df = df.resample('M').sum()  # Resample to monthly frequency for clarity
-
-        # Preprocessing: Log transform the sales data to stabilize variance
-        # Convert 'Sales' to numeric, coercing errors to NaN
-        # Remove commas, dollar signs, and other non-numeric characters
-        df['Sales'] = df['Sales'].replace({',': '', r'\$': '', ' ': ''}, regex=True)
-
-        # Convert to numeric, handling errors
-        df['Sales'] = pd.to_numeric(df['Sales'], errors='coerce')
+        # Only the two columns the model needs are loaded from the columnar store
+        with stage('column load'):
+            df = dataset_cache.get_or_compute(dataset_id, 'forecast_columns', lambda: read_dataset(content_key, ['Date', 'Sales']))
 
-        # Drop rows with invalid or missing Sales values
-        df.dropna(subset=['Sales'], inplace=True)
-
-        # Log transform the sales data to stabilize variance
-        df['Sales'] = np.log1p(df['Sales'])  # log1p to handle zero values
-        if df['Sales'].isnull().any():
-            st.error("Sales column contains invalid values even after cleaning. Please check your data.")
+        # Preprocessing (cached with the raw frame, so changing the horizon skips it)
+        try:
+            with stage('preprocessing'):
+                df = dataset_cache.get_or_compute(dataset_id, 'forecast_series', lambda: preprocess_sales(df))
+        except ValueError as e:
+            st.error(str(e))
             return
 
         # Updated SARIMA model with adjusted parameters for better seasonal handling
-        model = SARIMAX(df['Sales'], order=(2, 1, 2), seasonal_order=(1, 1, 1, 12))
-        model_fit = model.fit(disp=False)
+        order, seasonal_order = ORDER, SEASONAL_ORDER
+        if st.checkbox("Search the best SARIMA order automatically"):
+            criterion = st.selectbox("Rank candidates by", ['aic', 'holdout'],
+                                     format_func={'aic': 'AIC', 'holdout': 'Holdout RMSE'}.get)
+            budget = st.number_input("Search time budget (seconds):", min_value=5, value=120)
+            try:
+                with stage('order search'):
+                    search = dataset_cache.get_or_compute(
+                        dataset_id, ('order_search', criterion, budget),
+                        lambda: search_orders(df['Sales'], criterion=criterion, budget=budget))
+            except ValueError as e:
+                st.error(str(e))
+                return
+            order, seasonal_order = search['order'], search['seasonal_order']
+            st.success(f"Best model: SARIMA{order}x{seasonal_order} "
+                       f"({'AIC' if criterion == 'aic' else 'holdout RMSE'} {search['score']:,.2f}), "
+                       f"found in {search['seconds']:.1f} s")
+            if search['differencing'] is not None:
+                st.caption("Differencing d={}, D={} was chosen by KPSS and seasonal-strength tests; AIC only "
+                           "compared models with that differencing.".format(*search['differencing']))
+            with st.expander("Candidate models"):
+                st.dataframe(search['candidates'])
+
+        # Fits are persisted by data fingerprint and spec, so a new horizon only re-forecasts.
+        # A file that only adds periods to an earlier upload extends that fit instead of refitting.
+        incremental = st.checkbox("Update the stored model when new periods arrive (no full refit)", value=True)
+        with stage('model fit'):
+            model_fit, model_source = load_or_fit(df['Sales'], order=order, seasonal_order=seasonal_order,
+                                                  incremental=incremental)
+        st.caption({'memory': 'Reused the fitted model from this session.',
+                    'disk': 'Loaded a previously fitted model for this data.',
+                    'update': 'Extended the stored model with the new periods without re-estimating it.',
+                    'refit': 'New periods arrived, but drift or the refit schedule required a full refit.',
+                    'fit': 'Fitted a new model for this data.'}[model_source])
 
         # Forecast for specified months
-        forecast_log = model_fit.forecast(steps=num_months)
+        with stage('forecast'):
+            forecast_log = model_fit.forecast(steps=num_months)
         forecast = np.expm1(forecast_log)  # Inverse transformation to get original scale
 
         # Create forecast index starting from the last date in the dataset
-        forecast_index = pd.date_range(df.index[-1] + pd.DateOffset(months=1), periods=num_months, freq='M')
+        future_dates = forecast_index(df.index[-1], num_months)
 
         # Plotting the historical data and forecast
         fig = go.Figure()
         fig.add_trace(go.Scatter(x=df.index, y=np.expm1(df['Sales']), mode='lines', name='Historical Sales',
                                  line=dict(color='blue')))
         fig.add_trace(
-            go.Scatter(x=forecast_index, y=forecast, mode='lines', name='Forecasted Sales', line=dict(color='red')))
+            go.Scatter(x=future_dates, y=forecast, mode='lines', name='Forecasted Sales', line=dict(color='red')))
 
         # Improve x-axis readability for long timespans
         fig.update_xaxes(
@@ -102,6 +201,19 @@ def main():
         # Display the plot
         st.plotly_chart(fig)
 
+        # Rolling-origin accuracy and cost of the chosen specification
+        if st.checkbox("Backtest this model"):
+            show_backtest(dataset_id, df['Sales'], order, seasonal_order)
+
+
+def main():
+    # Per-stage timings for this run, shown in the Diagnostics panel even after an early return
+    diagnostics = start_run('forecasting')
+    try:
+        forecast_page(diagnostics)
+    finally:
+        show_diagnostics(diagnostics)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,51 @@
+import pandas as pd
+
+# Name of the row-count measure stored in every cube
+ROWS = 'Rows'
+
+
+def build_cube(df, dimensions, measures):
+    """
+    Aggregates the row-level frame in a single pass into a compact cube indexed by the given
+    dimensions (e.g. date x category x region). measures maps each output name to a column
+    name or to a Series aligned with df; every measure is summed and the row count is kept.
+    Dimensions that are None or missing from df are skipped.
+    """
+    dimensions = [col for col in dict.fromkeys(dimensions) if col and col in df.columns]
+    columns = {col: df[col] for col in dimensions}
+    for name, values in measures.items():
+        columns[name] = df[values] if isinstance(values, str) else values
+    frame = pd.DataFrame(columns, index=df.index)
+    frame[ROWS] = 1
+
+    if not dimensions:
+        return frame.sum().to_frame().T
+    # Missing dimension values are kept as their own cell so totals still cover every row
+    return frame.groupby(dimensions, observed=True, dropna=False, sort=False).sum()
+
+
+def merge_cubes(total, part):
+    """
+    Adds two cubes built over the same dimensions (used when aggregating chunk by chunk).
+    """
+    if total is None:
+        return part
+    levels = list(range(total.index.nlevels))
+    return pd.concat([total, part]).groupby(level=levels, observed=True, dropna=False, sort=False).sum()
+
+
+def rollup(cube, by=None, measures=None, dropna=True):
+    """
+    Rolls the cube up to the given dimensions and returns a flat frame ready for plotting.
+    With by=None the grand totals are returned as a Series.
+    """
+    if measures is not None:
+        cube = cube[list(measures)]
+    if not by:
+        return cube.sum()
+    by = [by] if isinstance(by, str) else list(by)
+    return cube.groupby(level=by, observed=True, dropna=dropna).sum().reset_index()
+
+
+def cube_dimensions(cube):
+    return [name for name in cube.index.names if name is not None]
@@ -1,10 +1,29 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import missingno as msno
+
+from aggregates import cube_dimensions, rollup
+from columnar_store import load_or_ingest, read_dataset
+from data_cache import dataset_cache, dataset_key, uploaded_file_key
+from diagnostics import show_diagnostics, stage, start_run
+from engine import analyze_dataset, clean_dataset
+from feeds import append_rows
+from memory_optimizer import optimize_memory, summarize_report
+from multi_ingest import file_summary, ingest_many
+from nullity import nullity_correlation, nullity_heatmap
+from rendering import bar_chart, histogram_chart, scatter_chart, show_line_chart
+from rolling_stats import sales_trend
+from schema_registry import header_fingerprint, resolve_roles
+from streaming import (MAX_TRACKED_HASHES, MODE_SKETCH_SIZE, profile_csv, read_header,
+                       replacement_values as streamed_replacements)
 
 st.title("EDA & Sales/Profit Analysis")
 
+# Per-stage timings for this run, shown in the Diagnostics panel at the bottom
+diagnostics = start_run('eda')
+
 st.markdown(
     """
     <style>
@@ -20,22 +39,255 @@ st.markdown(
 
 
 
-# Function to standardize column names dynamically
-def find_column(df, possible_names):
+def show_streaming_analysis(source, dataset_id, exact_medians):
+    """
+    Streaming counterpart of the page below: every statistic is accumulated chunk by chunk,
+    so peak memory depends on the chunk size instead of the file size.
+    """
+    header = read_header(source, nrows=5)
+    roles = resolve_roles(header.columns)
+    sales_column = roles['sales']
+    quantity_column = roles['quantity']
+    region_column = roles['region']
+    category_column = roles['category']
+    date_column = 'Date' if 'Date' in header.columns else None
+    cost_column_available = 'Cost' in header.columns
+    profit_column_available = 'Profit' in header.columns
+
+    value_columns = [sales_column]
+    if cost_column_available or profit_column_available:
+        value_columns.append('Profit')
+    if cost_column_available:
+        value_columns.append('Total_Cost')
+
+    def prepare_chunk(chunk):
+        if cost_column_available:
+            cost = pd.to_numeric(chunk['Cost'], errors='coerce')
+            if not profit_column_available and sales_column:
+                chunk['Profit'] = chunk[sales_column] - cost
+            chunk['Total_Cost'] = pd.to_numeric(chunk[quantity_column], errors='coerce') * cost if quantity_column else cost
+        return chunk
+
+    with stage('streaming profile'):
+        profile = dataset_cache.get_or_compute(
+            dataset_id, ('streamed_profile', exact_medians),
+            lambda: profile_csv(source, date_column=date_column, value_columns=value_columns,
+                                group_columns=[category_column, region_column], exact_medians=exact_medians,
+                                normalize_text=True, prepare_chunk=prepare_chunk))
+
+    st.write(f"Streamed {profile['rows']:,} rows")
+
+    st.write("### Raw Data Preview")
+    st.dataframe(profile['head'])
+
+    st.write("### Attribute Data Types")
+    st.dataframe(profile['dtypes'])
+
+    st.write("### Preview of Missing Values")
+    st.dataframe(profile['missing'])
+
+    replacement_values = streamed_replacements(profile)
+    if replacement_values:
+        st.write("### Missing Values Replaced With:")
+        st.write(replacement_values)
+        st.caption(f"Medians are {profile['median_method']}.")
+
+    if profile['approximate_modes']:
+        st.caption(f"Modes of {', '.join(profile['approximate_modes'])} are approximate: these columns have "
+                   f"more than {MODE_SKETCH_SIZE:,} distinct values.")
+
+    st.write("### Duplicate Rows Status")
+    st.write("Before removing duplicates:", profile['duplicates'], "duplicates")
+    if profile['duplicates_exact']:
+        st.write("After removing duplicates:", profile['duplicates_after'], "duplicates")
+    else:
+        st.write(f"After removing duplicates: not known; only rows matching the first {MAX_TRACKED_HASHES:,} "
+                 "distinct rows were detected and removed")
+    st.caption("In streaming mode rows are compared as uploaded, before missing values are filled.")
+
+    st.write("### Sales and Profit Analysis")
+    if not sales_column or not date_column:
+        st.warning("The 'Date' or 'Sales' column is missing or invalid for trend analysis.")
+        return
+
+    by_date = profile['sums_by_date']
+    by_category = profile['sums_by_group'].get(category_column)
+    by_region = profile['sums_by_group'].get(region_column)
+
+    if 'Profit' in value_columns:
+        st.subheader('Profit Analysis Over Time')
+        st.plotly_chart(px.line(by_date, x='Date', y='Profit', title='Profit Analysis Over Time',
+                                labels={'Date': 'Date', 'Profit': 'Total Profit'}))
+        if by_category is not None:
+            st.subheader('Profit by Category')
+            st.plotly_chart(px.bar(by_category, x=category_column, y='Profit', title='Profit by Category'))
+    else:
+        st.info("Profit-related graphs and analysis are not available due to missing required columns.")
+
+    st.subheader('Total Sales Over Time')
+    st.plotly_chart(px.line(by_date, x='Date', y=sales_column, title='Total Sales Over Time',
+                            labels={'Date': 'Date', 'Sales': 'Total Sales'}))
+    if by_category is not None:
+        st.subheader('Sales by Category')
+        st.plotly_chart(px.bar(by_category, x=category_column, y=sales_column, title='Sales by Category'))
+
+    st.subheader("Sales Performance by Region")
+    if by_region is not None:
+        st.plotly_chart(px.bar(by_region, x=region_column, y=sales_column, title="Sales Performance by Region",
+                               labels={region_column: "Region", sales_column: "Total Sales"}))
+    else:
+        st.warning("No column representing 'Region' was found in the dataset.")
+
+    # Rows are never held in memory here, so the moving average runs over daily totals
+    st.subheader("Sales Trends with Moving Average")
+    trend = sales_trend(by_date, 'Date', sales_column)
+    st.plotly_chart(px.line(trend, x='Date', y=[sales_column, 'MA_7'],
+                            title="Sales Trends with 7-Day Moving Average",
+                            labels={'value': 'Sales', 'variable': 'Legend'}))
+
+    total_sales = profile['totals'][sales_column]
+    if cost_column_available:
+        total_cost = profile['totals']['Total_Cost']
+        profit = total_sales - total_cost
+        profit_percentage = (profit / total_sales) * 100 if total_sales != 0 else 0
+        st.markdown(
+            f"""
+            <div class="card" style='width: 80%; margin: 0 auto;'>
+                <h2 style='font-size: 50px;'>Profit/Loss Analysis</h2>
+                <p style='font-size: 40px; font-style: italic;'>Total Sales: <strong>${total_sales:,.2f}</strong></p>
+                <p style='font-size: 40px; font-style: italic;'>Total Cost: <strong>${total_cost:,.2f}</strong></p>
+                <p style='font-size: 40px; font-style: italic;'>Profit: <strong>${profit:,.2f}</strong></p>
+                <p style='font-size: 40px; font-style: italic;'>Profit Percentage: <strong>{profit_percentage:.2f}%</strong></p>
+            </div>
+            """, unsafe_allow_html=True
+        )
+    else:
+        st.markdown(
+            f"""
+            <div class="card" style='width: 80%; margin: 0 auto;background-color: white;'>
+                <h2 style='font-size: 50px;'>Sales Analysis</h2>
+                <p style='font-size: 40px; font-style: italic;'>Total Sales: <strong>${total_sales:,.2f}</strong></p>
+            </div>
+            """, unsafe_allow_html=True
+        )
+
+def show_append_analysis(uploaded_file):
     """
-    Identifies a column in the DataFrame that matches any of the possible names.
-    Returns the column name if found, otherwise None.
+    Append mode: the upload holds only the new rows of a feed (a CSV header sent daily).
+    They are added to the aggregates stored for the feed and every chart is drawn from
+    those, so a refresh takes time proportional to the new rows, not to the history.
     """
-    for name in possible_names:
-        if name in df.columns:
-            return name
-    return None
+    with stage('ingestion'):
+        df = load_or_ingest(uploaded_file)
+    upload_key = uploaded_file_key(uploaded_file, encoding='latin1')
+    try:
+        with stage('append'):
+            cube, state, appended = append_rows(header_fingerprint(df.columns), upload_key, df)
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    upload = next(upload for upload in state['uploads'] if upload['key'] == upload_key)
+    if appended:
+        st.success(f"Added {upload['rows_added']:,} new rows ({upload['duplicates']:,} duplicates and "
+                   f"{upload['already_appended']:,} rows appended before were skipped).")
+    else:
+        st.info("This file was already appended; showing the feed's current totals.")
+    st.write(f"### Feed: {state['rows']:,} rows from {len(state['uploads'])} upload(s)")
+    st.dataframe(pd.DataFrame(state['uploads']).drop(columns='key'))
+
+    sales_column = state['roles']['sales']
+    category_column = state['roles']['category']
+    region_column = state['roles']['region']
+    if not sales_column or 'Date' not in state['dimensions']:
+        st.warning("The 'Date' or 'Sales' column is missing or invalid for trend analysis.")
+        return
+
+    by_date = rollup(cube, 'Date')
+    if state['has_profit']:
+        st.subheader('Profit Analysis Over Time')
+        st.plotly_chart(px.line(by_date, x='Date', y='Profit', title='Profit Analysis Over Time',
+                                labels={'Date': 'Date', 'Profit': 'Total Profit'}))
+
+    st.subheader('Total Sales Over Time')
+    trend = sales_trend(by_date, 'Date', sales_column)
+    st.plotly_chart(px.line(trend, x='Date', y=[sales_column, 'MA_7', 'MA_30'], title="Total Sales Over Time",
+                            labels={'value': 'Sales', 'variable': 'Legend'}))
+
+    if category_column in state['dimensions']:
+        st.subheader('Sales by Category')
+        st.plotly_chart(px.bar(rollup(cube, category_column), x=category_column, y=sales_column,
+                               title='Sales by Category'))
+    if region_column in state['dimensions']:
+        st.subheader("Sales Performance by Region")
+        st.plotly_chart(px.bar(rollup(cube, region_column), x=region_column, y=sales_column,
+                               title="Sales Performance by Region",
+                               labels={region_column: "Region", sales_column: "Total Sales"}))
+
+    totals = rollup(cube)
+    st.write(f"### Total Sales: ${totals[sales_column]:,.2f}")
+    if state['has_profit']:
+        st.write(f"### Total Profit: ${totals['Profit']:,.2f}")
 
 # Upload file
 uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
 
-if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file, encoding='latin1')
+# Streaming mode keeps memory bounded for files too large to load at once
+streaming_mode = st.checkbox("Streaming mode (bounded memory for very large files)")
+server_path = ''
+exact_medians = False
+if streaming_mode:
+    server_path = st.text_input("Or path to a CSV file on the server")
+    exact_medians = st.checkbox("Exact medians (slower, memory grows with distinct values)")
+
+# Append mode adds a daily file of new rows to the feed's stored aggregates
+append_mode = not streaming_mode and st.checkbox("Append mode (the file holds only new rows of a feed)")
+
+# Several files (e.g. one per store or state) are parsed concurrently and analyzed as one dataset
+uploaded_files = []
+if not streaming_mode and not append_mode and st.checkbox("Combine several files (one CSV per store or region)"):
+    uploaded_files = st.file_uploader("Upload the CSV files", type=["csv"], accept_multiple_files=True)
+
+if streaming_mode and (server_path or uploaded_file is not None):
+    if server_path:
+        if not os.path.isfile(server_path):
+            st.error(f"File not found: {server_path}")
+        else:
+            stat = os.stat(server_path)
+            show_streaming_analysis(server_path, dataset_key(f"{server_path}:{stat.st_size}:{stat.st_mtime_ns}".encode()), exact_medians)
+    else:
+        show_streaming_analysis(uploaded_file, uploaded_file_key(uploaded_file, encoding='latin1'), exact_medians)
+
+elif uploaded_file is not None and append_mode:
+    show_append_analysis(uploaded_file)
+
+elif uploaded_files or uploaded_file is not None:
+    # Every stage is cached under the upload's content hash, so selectbox changes
+    # below only recompute the chart that actually changed
+    if uploaded_files:
+        with stage('ingestion'):
+            dataset_id = ingest_many(uploaded_files)
+            df = dataset_cache.get_or_compute(dataset_id, 'raw', lambda: read_dataset(dataset_id))
+        st.write(f"### Combined {len(uploaded_files)} files")
+        st.dataframe(dataset_cache.get_or_compute(dataset_id, 'file_summary', lambda: file_summary(df)))
+        upload_key = dataset_id
+    else:
+        dataset_id = uploaded_file_key(uploaded_file, encoding='latin1')
+        # The first parse is persisted as typed Parquet; later sessions and pages memory-map it
+        with stage('ingestion'):
+            df = dataset_cache.get_or_compute(dataset_id, 'raw', lambda: load_or_ingest(uploaded_file))
+        upload_key = uploaded_file_key(uploaded_file)
+    diagnostics.context['dataset'] = dataset_id
+
+    # Optional memory optimization right after ingestion
+    memory_report = None
+    if st.checkbox("Optimize memory footprint (downcast numbers, categorize repeated strings)"):
+        lossy_floats = st.checkbox("Allow float32 for decimal columns (small rounding)")
+        with stage('memory optimization'):
+            df, memory_report = dataset_cache.get_or_compute(
+                dataset_id, ('optimized', lossy_floats), lambda: optimize_memory(df, lossy_floats=lossy_floats))
+        # Later stages are cached separately for the optimized frame
+        dataset_id = f"{dataset_id}:optimized:{lossy_floats}"
 
     # Raw data preview
     st.write("### Raw Data Preview")
@@ -43,31 +295,28 @@ if uploaded_file is not None:
 
     # Data types display
     st.write("### Attribute Data Types")
-    st.dataframe(df.dtypes)
+    if memory_report is not None:
+        st.dataframe(memory_report)
+        st.write(summarize_report(memory_report))
+    else:
+        st.dataframe(df.dtypes)
 
     # Missing values preview
     st.write("### Preview of Missing Values")
-    st.dataframe(df.isnull().sum())
+    st.dataframe(dataset_cache.get_or_compute(dataset_id, 'missing_before', lambda: df.isnull().sum()))
 
-    # Handle missing values
-    df_filled = df.copy()
-
-    # Dictionary to track replacement values
-    replacement_values = {}
+    # Rows already stored by earlier uploads with the same header can be dropped as well
+    feed = None
+    if st.checkbox("Drop rows already seen in earlier uploads of this feed"):
+        feed = header_fingerprint(df.columns)
+        # Later stages are cached separately for the deduplicated frame
+        dataset_id = f"{dataset_id}:new-rows"
 
-    for col in df.select_dtypes(include='number').columns:
-    # Fill missing numeric values with median
-        median_value = df[col].median()
-        if df[col].isnull().any():  # Only replace if there are missing values
-            df_filled[col].fillna(median_value, inplace=True)
-            replacement_values[col] = median_value
-
-    for col in df.select_dtypes(include='object').columns:
-        # Fill missing categorical values with mode
-        mode_value = df[col].mode()[0]
-        if df[col].isnull().any():  # Only replace if there are missing values
-            df_filled[col].fillna(mode_value, inplace=True)
-            replacement_values[col] = mode_value
+    # Handle missing values
+    with stage('cleaning'):
+        cleaned = dataset_cache.get_or_compute(
+            dataset_id, 'cleaned', lambda: clean_dataset(df, feed, upload_key))
+    replacement_values = cleaned['replacement_values']
 
     # Only display replacement information if something was actually replaced
     if replacement_values:
@@ -75,53 +324,60 @@ if uploaded_file is not None:
         st.write(replacement_values)
 
     st.write("### Missing Values After Filling")
-    st.dataframe(df_filled.isnull().sum())
+    st.dataframe(cleaned['missing_after'])
 
     # Remove duplicates
     st.write("### Duplicate Rows Status")
-    st.write("Before removing duplicates:", df.duplicated().sum(), "duplicates")
-    df_filled = df_filled.drop_duplicates()
-    st.write("After removing duplicates:", df_filled.duplicated().sum(), "duplicates")
+    st.write("Before removing duplicates:", cleaned['duplicates_before'], "duplicates")
+    st.write("After removing duplicates:", cleaned['duplicates_after'], "duplicates")
+    if feed is not None:
+        st.write(f"Rows already seen in {cleaned['earlier_uploads']} earlier upload(s) of this feed:",
+                 cleaned['seen_before'])
+    df_filled = cleaned['df_filled']
 
     # Display numeric and categorical data separately
     st.write("### Numeric Data")
     st.dataframe(df_filled.select_dtypes(include='number').head())
 
     st.write("### Categorical Data")
-    st.dataframe(df_filled.select_dtypes(include='object').head())
+    st.dataframe(df_filled.select_dtypes(include=['object', 'category']).head())
 
     # Correlation heatmap of nullity
     st.write("### Nullity Correlation Heatmap")
-    fig = msno.heatmap(df)
-    st.pyplot(fig.figure)
+    nullity_sample = st.number_input("Rows to sample for the nullity heatmap (0 = all rows)", min_value=0, value=0, step=100000)
+    with stage('nullity heatmap'):
+        corr, nullity_details = dataset_cache.get_or_compute(
+            dataset_id, ('nullity_correlation', nullity_sample),
+            lambda: nullity_correlation(df, sample_size=nullity_sample or None))
+    if len(corr.columns) < 2:
+        st.info("Fewer than two columns have missing values, so there is no nullity correlation to show.")
+    else:
+        st.plotly_chart(nullity_heatmap(corr))
+        if 'error_bound' in nullity_details:
+            st.caption(f"Stratified sample of {nullity_details['rows_used']:,} of {nullity_details['rows_total']:,} rows; "
+                       f"correlations within ±{nullity_details['error_bound']:.3f} (95%).")
 
-    # Uniformity check (example: lowercase all strings)
-    for col in df_filled.select_dtypes(include='object').columns:
-        df_filled[col] = df_filled[col].astype(str).str.lower().str.strip()
+    with stage('analysis (parsing, cube)'):
+        analysis = dataset_cache.get_or_compute(dataset_id, 'analysis', lambda: analyze_dataset(df_filled))
 
     st.write("### Data After Uniformity Check")
-    st.dataframe(df_filled.head())
+    st.dataframe(analysis['uniform_head'])
 
     # Sales and Profit Analysis
     st.write("### Sales and Profit Analysis")
 
-    # Ensure Date column is in datetime format
-    if 'Date' in df_filled.columns:
-        df_filled['Date'] = pd.to_datetime(df_filled['Date'], errors='coerce')
-        df_filled = df_filled.dropna(subset=['Date'])  # Drop rows with invalid/missing dates
-
-    # Check for 'Cost' and 'Profit' attributes
-    # Find columns dynamically
-    sales_column = find_column(df_filled, ["Amount","Sales", "Total_Sales", "Revenue","Amt","sales","amount"])
-    quantity_column = find_column(df_filled, ["Sales Quantity", "Quantity", "Qty","quantity","Holiday_Flag"])
-    region_column = find_column(df_filled, ["ship_state", "ship-state", "ship-city", "shopping_mall", "City", "State", "region","Store"])
-    category_column = find_column(df_filled, ["category","Category"])
-    cost_column_available = 'Cost' in df_filled.columns
-    profit_column_available = 'Profit' in df_filled.columns
+    sales_column = analysis['sales_column']
+    quantity_column = analysis['quantity_column']
+    region_column = analysis['region_column']
+    category_column = analysis['category_column']
+    cost_column_available = analysis['cost_column_available']
+    profit_column_available = analysis['profit_column_available']
+    df_filled = analysis['frame']
+    cube = analysis['cube']
+    has_date = 'Date' in cube_dimensions(cube)
 
     # Calculate profit if 'Cost' is available, or use existing 'Profit'
     if cost_column_available and not profit_column_available:
-        df_filled['Profit'] = df_filled[sales_column] - df_filled['Cost']
         st.success("Profit column calculated using 'Sales - Cost'.")
     elif profit_column_available:
         st.success("Profit column already available in the dataset.")
@@ -129,71 +385,64 @@ if uploaded_file is not None:
         st.warning("Neither 'Cost' nor 'Profit' column is available. Skipping profit-related analysis.")
 
     # Proceed with profit-related analysis if 'Profit' is available
-    if 'Profit' in df_filled.columns:
+    if analysis['has_profit']:
         # Profit Analysis Over Time
-        st.subheader('Profit Analysis Over Time')
-        profit_time_series = df_filled.groupby('Date')['Profit'].sum().reset_index()
-        profit_fig = px.line(
-            profit_time_series,
-            x='Date',
-            y='Profit',
-            title='Profit Analysis Over Time',
-            labels={'Date': 'Date', 'Profit': 'Total Profit'}
-        )
-        st.plotly_chart(profit_fig)
+        if has_date:
+            st.subheader('Profit Analysis Over Time')
+            with stage('chart: profit over time'):
+                profit_fig = px.line(
+                    rollup(cube, 'Date', ['Profit']),
+                    x='Date',
+                    y='Profit',
+                    title='Profit Analysis Over Time',
+                    labels={'Date': 'Date', 'Profit': 'Total Profit'}
+                )
+            st.plotly_chart(profit_fig)
 
         # Profit by Category
         if category_column:
             st.subheader('Profit by Category')
-            profit_by_category = df_filled.groupby(category_column)['Profit'].sum().reset_index()
-            profit_category_fig = px.bar(
-                profit_by_category,
-                x=category_column,
-                y='Profit',
-                title='Profit by Category'
-            )
+            with stage('chart: profit by category'):
+                profit_category_fig = px.bar(
+                    rollup(cube, category_column, ['Profit']),
+                    x=category_column,
+                    y='Profit',
+                    title='Profit by Category'
+                )
             st.plotly_chart(profit_category_fig)
-
-        # Display total profit
-        total_profit = df_filled['Profit'].sum()
-        # st.write(f"### Total Profit: {total_profit}")
     else:
         st.info("Profit-related graphs and analysis are not available due to missing required columns.")
 
     # Sales Analysis
     if sales_column:
-        df_filled[sales_column] = df_filled[sales_column].replace({',': ''}, regex=True)
-        df_filled[sales_column] = pd.to_numeric(df_filled[sales_column], errors='coerce')
-
-        # Drop rows with invalid sales values (NaN after conversion)
-        df_filled = df_filled.dropna(subset=[sales_column])
-
         # Total Sales Over Time
-        st.subheader('Total Sales Over Time')
-        sales_time_series = df_filled.groupby('Date')[sales_column].sum().reset_index()
-        sales_fig = px.line(
-            sales_time_series,
-            x='Date',
-            y=sales_column,
-            title='Total Sales Over Time',
-            labels={'Date': 'Date', 'Sales': 'Total Sales'}
-        )
-        st.plotly_chart(sales_fig)
+        if has_date:
+            st.subheader('Total Sales Over Time')
+            with stage('chart: sales over time'):
+                sales_fig = px.line(
+                    rollup(cube, 'Date', [sales_column]),
+                    x='Date',
+                    y=sales_column,
+                    title='Total Sales Over Time',
+                    labels={'Date': 'Date', 'Sales': 'Total Sales'}
+                )
+            st.plotly_chart(sales_fig)
 
         # Sales by Category
         if category_column:
             st.subheader('Sales by Category')
-            sales_by_category = df_filled.groupby(category_column)[sales_column].sum().reset_index()
-            category_fig = px.bar(
-                sales_by_category,
-                x=category_column,
-                y=sales_column,
-                title='Sales by Category'
-            )
+            with stage('chart: sales by category'):
+                category_fig = px.bar(
+                    rollup(cube, category_column, [sales_column]),
+                    x=category_column,
+                    y=sales_column,
+                    title='Sales by Category'
+                )
             st.plotly_chart(category_fig)
 
         # Display total sales
-        total_sales = df_filled[sales_column].sum()
+        totals = rollup(cube)
+        total_sales = totals[sales_column]
         # st.write(f"### Total Sales: {total_sales}")
     else:
         st.warning("The 'Sales' column is not available in the dataset.")
@@ -201,45 +450,50 @@ if uploaded_file is not None:
     # Distribution of Sales Quantities
     st.subheader("Distribution of Sales Quantities")
     if quantity_column:
-        sales_quantity_fig = px.histogram(
-            df_filled,
-            x=quantity_column,
-            title="Distribution of Sales Quantities",
-            nbins=20,
-            labels={quantity_column: "Sales Quantity"}
-        )
+        with stage('chart: quantity distribution'):
+            sales_quantity_fig = histogram_chart(
+                df_filled,
+                x=quantity_column,
+                title="Distribution of Sales Quantities",
+                nbins=20,
+                labels={quantity_column: "Sales Quantity"}
+            )
         st.plotly_chart(sales_quantity_fig)
     else:
         st.warning("The 'Sales Quantity' column is not available in the dataset.")
 
     # Sales Performance by Region
     st.subheader("Sales Performance by Region")
-    if region_column:
-        sales_by_region = df_filled.groupby(region_column)[sales_column].sum().reset_index()
-        sales_region_fig = px.bar(
-            sales_by_region,
-            x=region_column,
-            y=sales_column,
-            title="Sales Performance by Region",
-            labels={region_column: "Region", sales_column: "Total Sales"}
-        )
+    if region_column and sales_column:
+        with stage('chart: sales by region'):
+            sales_region_fig = px.bar(
+                rollup(cube, region_column, [sales_column]),
+                x=region_column,
+                y=sales_column,
+                title="Sales Performance by Region",
+                labels={region_column: "Region", sales_column: "Total Sales"}
+            )
         st.plotly_chart(sales_region_fig)
     else:
         st.warning("No column representing 'Region' was found in the dataset.")
 
     # Sales Trends with Moving Average
     st.subheader("Sales Trends with Moving Average")
-    if 'Date' in df_filled.columns and sales_column:
-        df_filled = df_filled.sort_values(by='Date')  # Sort by date
-        df_filled['Sales_MA_7'] = df_filled[sales_column].rolling(window=7).mean()  # 7-day moving average
-        sales_trend_ma_fig = px.line(
-            df_filled,
-            x='Date',
-            y=[sales_column, 'Sales_MA_7'],
-            title="Sales Trends with 7-Day Moving Average",
-            labels={'value': 'Sales', 'variable': 'Legend'},
-        )
-        st.plotly_chart(sales_trend_ma_fig)
+    trend = analysis['trend']
+    if trend is not None:
+        statistics = st.multiselect("Rolling statistics (over calendar days)",
+                                    [col for col in trend.columns if col not in ('Date', sales_column)],
+                                    default=['MA_7'])
+        # Downsampled with LTTB; the zoom slider re-fetches full resolution for narrow windows
+        with stage('chart: moving average'):
+            show_line_chart(
+                trend,
+                x='Date',
+                y=[sales_column, *statistics],
+                key='sales_ma_zoom',
+                title="Daily Sales with Rolling Statistics",
+                labels={'value': 'Sales', 'variable': 'Legend'},
+            )
     else:
         st.warning("The 'Date' or 'Sales' column is missing or invalid for trend analysis.")
 
@@ -247,7 +501,7 @@ if uploaded_file is not None:
     if sales_column:
         if cost_column_available:
             # Calculate total cost based on 'Cost' and 'Quantity'
-            total_cost = (df_filled[quantity_column] * df_filled['Cost']).sum() if quantity_column else df_filled['Cost'].sum()
+            total_cost = totals['Total_Cost']
             profit = total_sales - total_cost
             profit_percentage = (profit / total_sales) * 100 if total_sales != 0 else 0
 
@@ -264,7 +518,7 @@ if uploaded_file is not None:
             )
         elif profit_column_available:
             # If 'Profit' column is available
-            profit = total_sales - df_filled['Profit'].sum()
+            profit = total_sales - totals['Profit']
             profit_percentage = (profit / total_sales) * 100 if total_sales != 0 else 0
 
             st.markdown(
@@ -305,16 +559,21 @@ if uploaded_file is not None:
             chart_type = st.selectbox("Select chart type", ['Bar', 'Line', 'Scatter', 'Histogram'])
 
             # Generate chart based on selected type
-            if chart_type == 'Bar':
-                fig = px.bar(df, x=col1, y=col2, title=f'{col1} vs {col2}')
-            elif chart_type == 'Line':
-                fig = px.line(df, x=col1, y=col2, title=f'{col1} vs {col2}')
-            elif chart_type == 'Scatter':
-                fig = px.scatter(df, x=col1, y=col2, title=f'{col1} vs {col2}')
-            else:
-                fig = px.histogram(df, x=col1, title=f'{col1} Distribution')
-
-            st.plotly_chart(fig)
+            # Large frames are aggregated, downsampled or drawn with WebGL before plotting
+            with stage(f'chart: custom {chart_type.lower()}'):
+                if chart_type == 'Line':
+                    show_line_chart(df, x=col1, y=col2, key='custom_line_zoom', title=f'{col1} vs {col2}')
+                else:
+                    if chart_type == 'Bar':
+                        fig = bar_chart(df, x=col1, y=col2, title=f'{col1} vs {col2}')
+                    elif chart_type == 'Scatter':
+                        fig = scatter_chart(df, x=col1, y=col2, title=f'{col1} vs {col2}')
+                    else:
+                        fig = histogram_chart(df, x=col1, title=f'{col1} Distribution')
+
+                    st.plotly_chart(fig)
+
+show_diagnostics(diagnostics)
 st.markdown("""
     <style>
     .stAlert {
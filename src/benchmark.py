@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+from aggregates import build_cube, rollup
+from cleaning import impute_missing, normalize_text
+from date_parsing import parse_dates
+from engine import remove_duplicates
+from forecasting import ORDER, SEASONAL_ORDER, preprocess_sales
+from nullity import nullity_correlation, nullity_heatmap
+from rolling_stats import sales_trend
+from streaming import profile_csv
+from synthetic_data import write_sales_csv
+
+STAGES = ['read', 'fill', 'dedup', 'nullity', 'groupby', 'moving_average', 'sarimax', 'stream']
+
+# Largest file the in-memory stages load whole; bigger sizes (e.g. 10^8 rows) only run the
+# streaming stage, whose memory is bounded by the chunk size
+MAX_IN_MEMORY_ROWS = int(float(os.environ.get("SALES_BENCH_MAX_IN_MEMORY_ROWS", "1e7")))
+
+
+def measure(function, *args, **kwargs):
+    """
+    Runs function(*args, **kwargs) and returns (result, stats) with wall time, CPU time and
+    the peak memory allocated during the call. tracemalloc (which numpy and pandas report
+    to) slows allocation-heavy code, so the time comes from an untraced run and the peak
+    memory from a second, traced run.
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = function(*args, **kwargs)
+    stats = {'seconds': time.perf_counter() - wall, 'cpu_seconds': time.process_time() - cpu}
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        stats['peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+    return result, stats
+
+
+def _groupbys(df):
+    # The EDA page's aggregations: one Date x Category x Region cube and its rollups
+    cube = build_cube(df, ['Date', 'Category', 'ship_state'], {'Amount': 'Amount', 'Qty': 'Qty'})
+    return [rollup(cube, 'Date'), rollup(cube, 'Category'), rollup(cube, 'ship_state')]
+
+
+def _moving_average(df):
+    return sales_trend(df, 'Date', 'Amount')
+
+
+def _sarimax(df):
+    series = preprocess_sales(df[['Date', 'Sales']])['Sales']
+    return SARIMAX(series, order=ORDER, seasonal_order=SEASONAL_ORDER).fit(disp=False)
+
+
+def _stream(path):
+    # The streaming EDA page's single pass over the file
+    return profile_csv(path, date_column='Date', value_columns=['Amount', 'Qty'],
+                       group_columns=['Category', 'ship_state'], normalize_text=True)
+
+
+def run_stages(path, stages=STAGES, nullity_sample=None, in_memory=True):
+    """
+    Runs the pipeline stages on one CSV in the order the app does, each measured
+    separately. Without in_memory only the streaming stage runs. Returns {stage: stats}.
+    """
+    results = {}
+    if 'stream' in stages:
+        _, results['stream'] = measure(_stream, path)
+    if not in_memory:
+        return results
+    raw, results['read'] = measure(pd.read_csv, path, encoding='latin1')
+    df = raw
+    if 'fill' in stages:
+        df, results['fill'] = measure(lambda: impute_missing(raw)[0])
+    if 'dedup' in stages:
+        # The app's hash-based removal (rows as uploaded, then rows identical once filled)
+        df, results['dedup'] = measure(lambda: remove_duplicates(raw, df)['df_filled'])
+    if 'nullity' in stages:
+        # Measured on the raw file, as the page does, so there are nulls to correlate
+        _, results['nullity'] = measure(lambda: nullity_heatmap(nullity_correlation(raw, nullity_sample)[0]))
+    del raw
+    df = normalize_text(df)
+    df['Date'] = parse_dates(df['Date'])
+    if 'groupby' in stages:
+        _, results['groupby'] = measure(_groupbys, df)
+    if 'moving_average' in stages:
+        _, results['moving_average'] = measure(_moving_average, df)
+    if 'sarimax' in stages:
+        _, results['sarimax'] = measure(_sarimax, df)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, repeat=1, stages=STAGES, data_dir=None, nullity_sample=None, progress=print, **data_options):
+    """
+    Generates (or reuses) a synthetic CSV per size and runs every stage `repeat` times.
+    Sizes above MAX_IN_MEMORY_ROWS only run the streaming stage. Returns the JSON-ready
+    report: environment, data options and, per size and stage, the minimum wall time over
+    the repeats with its CPU time and peak memory.
+    """
+    data_dir = data_dir or tempfile.mkdtemp(prefix='sales_bench_')
+    os.makedirs(data_dir, exist_ok=True)
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'repeat': repeat,
+        'max_in_memory_rows': MAX_IN_MEMORY_ROWS,
+        'data_options': data_options,
+        'results': [],
+    }
+    for rows in sizes:
+        name = '_'.join([f"sales_{rows}"] + [f"{key}{value}" for key, value in sorted(data_options.items())])
+        path = os.path.join(data_dir, f"{name}.csv")
+        if not os.path.exists(path):
+            write_sales_csv(path, rows, **data_options)
+        in_memory = rows <= MAX_IN_MEMORY_ROWS
+        if not in_memory and progress is not None:
+            progress(f"{rows:>12,}  in-memory stages skipped (more than {MAX_IN_MEMORY_ROWS:,} rows)")
+        runs = [run_stages(path, stages, nullity_sample, in_memory) for _ in range(repeat)]
+        for stage in runs[0]:
+            best = min((run[stage] for run in runs), key=lambda stats: stats['seconds'])
+            row = {'rows': rows, 'stage': stage, **{key: round(value, 4) for key, value in best.items()}}
+            report['results'].append(row)
+            if progress is not None:
+                progress(f"{rows:>12,}  {stage:<15} {row['seconds']:>9.3f} s  {row['peak_mb']:>9.1f} MB")
+    return report
+
+
+def compare(baseline, current):
+    """
+    Joins two reports on (rows, stage) with the current/baseline ratio of time and memory.
+    """
+    columns = ['rows', 'stage', 'seconds', 'peak_mb']
+    old = pd.DataFrame(baseline['results'])[columns]
+    new = pd.DataFrame(current['results'])[columns]
+    table = old.merge(new, on=['rows', 'stage'], suffixes=('_base', '_new'))
+    table['time_ratio'] = (table['seconds_new'] / table['seconds_base']).round(3)
+    table['memory_ratio'] = (table['peak_mb_new'] / table['peak_mb_base']).round(3)
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile every pipeline stage on synthetic data.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    run = subparsers.add_parser('run', help="run the suite")
+    run.add_argument('--rows', type=float, nargs='+', default=[1e4, 1e5, 1e6], help="dataset sizes, e.g. 1e4 1e6")
+    run.add_argument('--repeat', type=int, default=1)
+    run.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    run.add_argument('--output', default='benchmark.json', help="where to write the JSON report")
+    run.add_argument('--data-dir', help="keep generated CSVs here and reuse them on later runs")
+    run.add_argument('--nullity-sample', type=int, help="rows sampled for the nullity heatmap")
+    run.add_argument('--null-rate', type=float, default=0.05)
+    run.add_argument('--duplicate-rate', type=float, default=0.02)
+    run.add_argument('--categories', type=int, default=9)
+    run.add_argument('--regions', type=int, default=14)
+    run.add_argument('--days', type=int, default=1461)
+
+    diff = subparsers.add_parser('compare', help="compare two reports")
+    diff.add_argument('baseline')
+    diff.add_argument('current')
+
+    args = parser.parse_args(argv)
+    # Convergence and deprecation warnings from every repeat would bury the results
+    warnings.simplefilter('ignore')
+    if args.command == 'compare':
+        with open(args.baseline) as f, open(args.current) as g:
+            print(compare(json.load(f), json.load(g)).to_string(index=False))
+        return 0
+    if args.command != 'run':
+        parser.print_help()
+        return 2
+
+    report = run_suite([int(rows) for rows in args.rows], args.repeat, args.stages, args.data_dir,
+                       args.nullity_sample, null_rate=args.null_rate, duplicate_rate=args.duplicate_rate,
+                       categories=args.categories, regions=args.regions, days=args.days)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,4 @@
+# Text columns with at most this share of distinct values are stored as categoricals.
+# Shared by the Parquet store, text normalization and the memory optimizer so a column
+# gets the same dtype whichever of them converts it.
+CATEGORY_RATIO = 0.5
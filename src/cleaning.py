@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from categoricals import CATEGORY_RATIO
+
+
+def replacement_values_for(df):
+    """
+    Median for every numeric column and mode for every text/categorical column that has
+    missing values, computed in one vectorized call per dtype group.
+    """
+    has_missing = df.isnull().any()
+    numeric = [col for col in df.select_dtypes(include='number').columns if has_missing[col]]
+    text = [col for col in df.select_dtypes(include=['object', 'category']).columns if has_missing[col]]
+
+    replacements = {}
+    if numeric:
+        replacements.update(df[numeric].median().dropna().to_dict())
+    for col in text:
+        modes = df[col].mode()
+        if len(modes):
+            replacements[col] = modes[0]
+    return replacements
+
+
+def impute_missing(df):
+    """
+    Fills missing numeric values with the median and text values with the mode in a single
+    fillna pass. Returns the filled frame and the replacement used for each column.
+    """
+    replacements = replacement_values_for(df)
+    if not replacements:
+        return df.copy(), replacements
+    return df.fillna(replacements), replacements
+
+
+def _normalize_uniques(values):
+    # Lowercase/strip text, leaving missing values missing
+    return pd.Index(values).astype(str).str.lower().str.strip()
+
+
+def normalize_text_column(series, category_ratio=CATEGORY_RATIO):
+    """
+    Lowercases and strips a text column by normalizing each distinct value once and mapping
+    the result back through integer codes. Low-cardinality columns come back as categoricals.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+
+    normalized = _normalize_uniques(uniques)
+    # Different raw spellings ("Goa", " goa") may collapse into one normalized value
+    new_codes, new_uniques = pd.factorize(normalized)
+    codes = np.where(codes >= 0, new_codes[codes] if len(new_codes) else codes, -1)
+
+    if len(new_uniques) <= category_ratio * len(series):
+        return pd.Series(pd.Categorical.from_codes(codes, categories=new_uniques), index=series.index, name=series.name)
+    values = np.asarray(new_uniques, dtype=object).take(codes) if len(new_uniques) else np.full(len(series), np.nan, dtype=object)
+    values[codes < 0] = np.nan
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def normalize_text(df, category_ratio=CATEGORY_RATIO):
+    """
+    Applies normalize_text_column to every text and categorical column.
+    """
+    df = df.copy()
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        df[col] = normalize_text_column(df[col], category_ratio)
+    return df
+
+
+def to_numeric(series):
+    """
+    Converts number-like text such as "1,234" to numbers (invalid values become NaN).
+    Categorical columns are converted once per category instead of once per row.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.to_numeric(series.cat.categories.astype(str).str.replace(',', ''), errors='coerce')
+        codes = series.cat.codes.to_numpy()
+        values = np.asarray(categories, dtype='float64').take(codes) if len(categories) else np.full(len(series), np.nan)
+        values[codes < 0] = np.nan
+        return pd.Series(values, index=series.index, name=series.name)
+    if series.dtype == object:
+        series = series.replace({',': ''}, regex=True)
+    return pd.to_numeric(series, errors='coerce')
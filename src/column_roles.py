@@ -0,0 +1,38 @@
+# Candidate names for each column role, in order of preference
+SALES_COLUMNS = ["Amount","Sales", "Total_Sales", "Revenue","Amt","sales","amount"]
+QUANTITY_COLUMNS = ["Sales Quantity", "Quantity", "Qty","quantity","Holiday_Flag"]
+REGION_COLUMNS = ["ship_state", "ship-state", "ship-city", "shopping_mall", "City", "State", "region","Store"]
+CATEGORY_COLUMNS = ["category","Category"]
+DATE_COLUMNS = ["Date"]
+COST_COLUMNS = ["Cost"]
+
+# Every role the EDA and forecasting pages detect, as remembered by the schema registry
+ROLE_COLUMNS = {
+    "sales": SALES_COLUMNS,
+    "quantity": QUANTITY_COLUMNS,
+    "region": REGION_COLUMNS,
+    "category": CATEGORY_COLUMNS,
+    "date": DATE_COLUMNS,
+    "cost": COST_COLUMNS,
+}
+
+
+# Function to standardize column names dynamically
+def find_column(df, possible_names):
+    """
+    Identifies a column in the DataFrame that matches any of the possible names.
+    Returns the column name if found, otherwise None.
+    """
+    columns = df.columns if hasattr(df, 'columns') else df
+    for name in possible_names:
+        if name in columns:
+            return name
+    return None
+
+
+def segment_columns(columns):
+    """
+    Every column that can split the data into segments (stores, regions, categories),
+    found through the same role lists the EDA page uses.
+    """
+    return [name for name in REGION_COLUMNS + CATEGORY_COLUMNS if name in columns]
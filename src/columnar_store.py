@@ -0,0 +1,200 @@
+import io
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from categoricals import CATEGORY_RATIO
+from data_cache import uploaded_file_key
+from date_parsing import DATE_FORMATS, infer_date_format, parse_dates
+from schema_registry import load_schema, read_options, save_schema
+
+# Directory holding one typed, compressed Parquet file per uploaded dataset
+STORE_DIR = os.environ.get(
+    "SALES_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sales_store"))
+
+# Share of non-missing values that must parse for a column to be retyped as date/number
+PARSE_THRESHOLD = 0.95
+
+
+def store_path(content_key):
+    return os.path.join(STORE_DIR, f"{content_key}.parquet")
+
+
+def is_stored(content_key):
+    return os.path.exists(store_path(content_key))
+
+
+def _clean_numeric_text(series):
+    return pd.to_numeric(series.astype(str).str.replace(r'[,$\s]', '', regex=True), errors='coerce')
+
+
+def to_columnar_types(df, sample_size=1000):
+    """
+    Gives text columns proper dtypes before they are written: date columns become datetime,
+    number-like text (e.g. "1,234.50") becomes numeric, repeated strings become categoricals.
+    Each conversion is first tried on a small sample so obvious mismatches cost nothing.
+    """
+    df = df.copy()
+    for col in df.select_dtypes(include='object').columns:
+        series = df[col]
+        present = series.notna().sum()
+        if present == 0:
+            continue
+        sample = series.dropna().head(sample_size)
+
+        if 'date' in str(col).lower() and parse_dates(sample).notna().mean() >= PARSE_THRESHOLD:
+            parsed = parse_dates(series)
+            if parsed.notna().sum() >= PARSE_THRESHOLD * present:
+                df[col] = parsed
+                continue
+
+        if _clean_numeric_text(sample).notna().mean() >= PARSE_THRESHOLD:
+            numeric = _clean_numeric_text(series.dropna()).reindex(series.index)
+            if numeric.notna().sum() >= PARSE_THRESHOLD * present:
+                df[col] = numeric
+                continue
+
+        # Parquet needs a single type per column, so mixed objects are stored as text
+        if pd.api.types.infer_dtype(series, skipna=True) != 'string':
+            series = series.where(series.isna(), series.astype(str))
+        if series.nunique() <= CATEGORY_RATIO * len(series):
+            series = series.astype('category')
+        df[col] = series
+    return df
+
+
+def describe_types(raw, typed):
+    """
+    What to_columnar_types did to each column, as the schema registry stores it: the dtype
+    read_csv should use, the columns that are numbers written as text and the format of
+    every date column.
+    """
+    dtypes, numeric_text, date_formats = {}, [], {}
+    for col in typed.columns:
+        dtype = typed[col].dtype
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            dtypes[col] = 'object'
+            date_formats[col] = infer_date_format(raw[col].dropna().unique())
+        elif raw[col].dtype == object and pd.api.types.is_numeric_dtype(dtype):
+            dtypes[col] = 'object'
+            numeric_text.append(col)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            dtypes[col] = 'category'
+        else:
+            dtypes[col] = dtype.name
+    return {'dtypes': dtypes, 'numeric_text': numeric_text, 'date_formats': date_formats}
+
+
+def apply_schema(df, schema):
+    """
+    Applies a registered schema's cleaning rules to a frame read with its dtypes. Raises
+    ValueError when a column no longer parses the way it did when the schema was learned.
+    """
+    for col, fmt in schema['date_formats'].items():
+        if col in df.columns:
+            parsed = parse_dates(df[col], col, formats=[fmt] if fmt else DATE_FORMATS)
+            if parsed.notna().sum() < PARSE_THRESHOLD * df[col].notna().sum():
+                raise ValueError(f"Column {col} no longer matches date format {fmt}")
+            df[col] = parsed
+    for col in schema['numeric_text']:
+        if col in df.columns:
+            series = df[col]
+            numeric = _clean_numeric_text(series.dropna()).reindex(series.index)
+            if numeric.notna().sum() < PARSE_THRESHOLD * series.notna().sum():
+                raise ValueError(f"Column {col} is no longer numeric")
+            df[col] = numeric
+    return df
+
+
+def read_csv_bytes(data, encodings=('latin1',), **options):
+    """
+    Parses CSV bytes with pd.read_csv, trying each encoding in turn until one decodes the
+    file; options go to read_csv.
+    """
+    for encoding in encodings[:-1]:
+        try:
+            return pd.read_csv(io.BytesIO(data), encoding=encoding, **options)
+        except UnicodeDecodeError:
+            pass
+    return pd.read_csv(io.BytesIO(data), encoding=encodings[-1], **options)
+
+
+def read_typed(data, encodings=('latin1',)):
+    """
+    Parses CSV bytes with read_csv_bytes into typed columns. A header seen before is read
+    with its registered dtypes and rules, skipping every inference step; a new header goes
+    through to_columnar_types once and the result is registered for the next upload.
+    """
+    def read_csv(data, **options):
+        return read_csv_bytes(data, encodings, **options)
+
+    columns = list(read_csv(data, nrows=0).columns)
+    schema = load_schema(columns)
+    if schema is not None and 'dtypes' in schema:
+        try:
+            return apply_schema(read_csv(data, **read_options(schema)), schema)
+        except (ValueError, TypeError):
+            # The feed changed under the same header (e.g. nulls in an integer column):
+            # detect again and replace the schema
+            pass
+    raw = read_csv(data)
+    typed = to_columnar_types(raw)
+    save_schema({'columns': columns, **describe_types(raw, typed)})
+    return typed
+
+
+def write_dataset(df, content_key):
+    """
+    Writes the typed frame as zstd-compressed Parquet. The file is renamed into place
+    so concurrent sessions never see a partially written store.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=STORE_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+        os.replace(tmp_path, store_path(content_key))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return store_path(content_key)
+
+
+def read_columns(content_key):
+    """
+    Column names of a stored dataset, read from the Parquet footer only.
+    """
+    return pq.read_schema(store_path(content_key)).names
+
+
+def read_dataset(content_key, columns=None):
+    """
+    Memory-maps the stored file and materializes only the requested columns.
+    """
+    if columns is not None:
+        available = set(read_columns(content_key))
+        columns = [col for col in columns if col in available]
+    table = pq.read_table(store_path(content_key), columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def ingest(uploaded_file, encodings=('latin1',)):
+    """
+    Parses the upload once with read_typed and persists it, unless it is already stored.
+    The encodings are part of the key, so pages that decode the same file differently keep
+    separate copies. Returns the content key shared by every page that reads it the same way.
+    """
+    content_key = uploaded_file_key(uploaded_file, encodings=tuple(encodings))
+    if not is_stored(content_key):
+        write_dataset(read_typed(uploaded_file.getvalue(), encodings), content_key)
+    return content_key
+
+
+def load_or_ingest(uploaded_file, columns=None, encodings=('latin1',)):
+    """
+    Returns the typed dataset for an upload, parsing the CSV text only the first time
+    any page sees it. Later loads memory-map the stored Parquet file.
+    """
+    return read_dataset(ingest(uploaded_file, encodings), columns=columns)
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Memory budget for the shared dataset cache, in megabytes
+DEFAULT_BUDGET_MB = int(os.environ.get("SALES_CACHE_MB", "2048"))
+
+# Upload digests remembered per Streamlit file id (least recently used dropped first)
+MAX_UPLOAD_DIGESTS = int(os.environ.get("SALES_MAX_UPLOAD_DIGESTS", "1024"))
+
+
+def dataset_key(data, **options):
+    """
+    Builds a cache key from the raw uploaded bytes plus any options that change
+    how the data is parsed or cleaned (encoding, fill strategy, ...).
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(data)
+    for name in sorted(options):
+        digest.update(f"|{name}={options[name]!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Digest of the uploads most recently hashed in this process, keyed by Streamlit file id
+_upload_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def uploaded_file_key(uploaded_file, **options):
+    """
+    Same as dataset_key but for a Streamlit UploadedFile. The digest of the
+    upload is remembered per file id so widget reruns do not rehash the bytes.
+    """
+    file_id = getattr(uploaded_file, "file_id", None)
+    with _digests_lock:
+        digest = _upload_digests.get(file_id) if file_id is not None else None
+        if digest is not None:
+            _upload_digests.move_to_end(file_id)
+    if digest is None:
+        digest = dataset_key(uploaded_file.getvalue())
+        if file_id is not None:
+            with _digests_lock:
+                _upload_digests[file_id] = digest
+                while len(_upload_digests) > MAX_UPLOAD_DIGESTS:
+                    _upload_digests.popitem(last=False)
+    return dataset_key(digest.encode("utf-8"), **options)
+
+
+def estimate_size(value):
+    """
+    Approximates the in-memory size of a cached value in bytes.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class DatasetCache:
+    """
+    Process-wide LRU cache for parsed frames, cleaned frames and derived aggregates.
+    Entries are addressed by (dataset key, artifact name) and evicted least recently
+    used first once the total size goes over the memory budget.
+    Cached values are shared between reruns and sessions, so callers must treat
+    them as read-only and copy before mutating.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, name, default=None):
+        with self._lock:
+            entry = self._entries.get((key, name))
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end((key, name))
+            return entry[0]
+
+    def put(self, key, name, value):
+        size = estimate_size(value)
+        with self._lock:
+            self._discard((key, name))
+            # Values larger than the whole budget are returned but never kept
+            if size > self.budget_bytes:
+                return value
+            self._entries[(key, name)] = (value, size)
+            self.total_bytes += size
+            self._evict()
+        return value
+
+    def get_or_compute(self, key, name, compute):
+        """
+        Returns the cached artifact, computing and storing it on a miss.
+        """
+        with self._lock:
+            if (key, name) in self._entries:
+                self.hits += 1
+                self._entries.move_to_end((key, name))
+                return self._entries[(key, name)][0]
+            self.misses += 1
+        # Compute outside the lock so other sessions are not blocked
+        return self.put(key, name, compute())
+
+    def invalidate(self, key):
+        """
+        Drops every artifact stored for a dataset.
+        """
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == key]:
+                self._discard(entry_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self.total_bytes / (1024 * 1024), 2),
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _discard(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def _evict(self):
+        while self.total_bytes > self.budget_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+
+
+# Shared instance used by app.py, gg.py and Sales_Forecasting.py
+dataset_cache = DatasetCache()
@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Formats tried during inference, in order of preference for ambiguous values
+# (e.g. 01/02/2015 is read month-first, as the pages always have)
+DATE_FORMATS = [
+    '%m/%d/%Y', '%d-%m-%Y', '%Y-%m-%d', '%m-%d-%y', '%m/%d/%y', '%d/%m/%Y', '%m-%d-%Y',
+    '%Y/%m/%d', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y %H:%M', '%d-%b-%Y', '%b %d, %Y',
+]
+
+# Distinct values sampled to infer a format, and the share of them a format must parse
+SAMPLE_SIZE = 1000
+MATCH_THRESHOLD = 0.95
+
+# Format detected for each column name, reused on the next upload while it still matches
+_column_formats = {}
+_lock = threading.Lock()
+
+
+def _match_rate(values, fmt):
+    return pd.to_datetime(values, format=fmt, errors='coerce').notna().mean()
+
+
+def infer_date_format(values, formats=DATE_FORMATS, sample_size=SAMPLE_SIZE):
+    """
+    Returns the format that parses the largest share of a sample of the distinct values
+    (the first such format on ties), or None if no format parses any of them.
+    """
+    sample = pd.Index(values).dropna()[:sample_size].astype(str)
+    if not len(sample):
+        return None
+    best, best_rate = None, 0.0
+    for fmt in formats:
+        rate = _match_rate(sample, fmt)
+        if rate > best_rate:
+            best, best_rate = fmt, rate
+            if rate == 1.0:
+                break
+    return best
+
+
+def _parse_uniques(uniques, fmt, formats):
+    # The detected format parses almost everything in one vectorized call; values it
+    # misses go through the other formats and finally pandas' own inference
+    parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[ns]')
+    text = pd.Series(uniques, dtype=object).astype(str)
+    for candidate in ([fmt] if fmt else []) + [f for f in formats if f != fmt]:
+        remaining = parsed.isna()
+        if not remaining.any():
+            return parsed
+        parsed[remaining] = pd.to_datetime(text[remaining], format=candidate, errors='coerce')
+    remaining = parsed.isna()
+    if remaining.any():
+        parsed[remaining] = pd.to_datetime(text[remaining], errors='coerce', format='mixed')
+    return parsed
+
+
+def parse_dates(series, column=None, formats=DATE_FORMATS):
+    """
+    Parses a date column to datetime64, invalid values becoming NaT. Each distinct string is
+    parsed once and the results are mapped back through integer codes, so a 10M-row order
+    log with a few thousand dates parses a few thousand strings. The format is inferred
+    from a sample and remembered per column name (defaults to series.name).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+
+    column = series.name if column is None else column
+    with _lock:
+        fmt = _column_formats.get(column)
+    sample = pd.Index(uniques)[:SAMPLE_SIZE].astype(str)
+    if fmt is None or (len(sample) and _match_rate(sample, fmt) < MATCH_THRESHOLD):
+        fmt = infer_date_format(sample, formats)
+        if fmt is not None and column is not None:
+            with _lock:
+                _column_formats[column] = fmt
+
+    parsed = _parse_uniques(uniques, fmt, formats).to_numpy()
+    values = parsed.take(codes) if len(parsed) else np.full(len(series), np.datetime64('NaT', 'ns'))
+    values[codes < 0] = np.datetime64('NaT')
+    return pd.Series(values, index=series.index, name=series.name)
+
@@ -0,0 +1,153 @@
+import json
+import os
+import socket
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+import streamlit as st
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# When set, every page run appends one JSON line per stage to this file
+LOG_PATH = os.environ.get("SALES_DIAGNOSTICS_LOG")
+
+# Python-level peak memory per stage needs tracemalloc, which slows allocation-heavy code
+# and is process-wide, so it is only switched on by this variable
+TRACE_MEMORY = os.environ.get("SALES_TRACE_MEMORY", "") not in ("", "0")
+
+if TRACE_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+_log_lock = threading.Lock()
+
+# Recorder of the page run executing in this thread (each Streamlit session runs in its own)
+_current = threading.local()
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if os.uname().sysname == 'Darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024)
+
+
+class StageRecorder:
+    """
+    Records wall time, CPU time (of the running thread) and memory for each named stage of
+    one page run. Stages can nest; a stage's numbers include its children.
+    """
+
+    def __init__(self, page, log_path=LOG_PATH):
+        self.page = page
+        self.log_path = log_path
+        self.run_id = uuid.uuid4().hex[:12]
+        self.context = {}
+        self.rows = []
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        frame = {'peak': 0}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Resetting the peak below would lose the parent's peak so far
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame.update(start_memory=current, peak=current)
+        row = {'Stage': name, 'Depth': len(self._stack)}
+        self.rows.append(row)
+        self._stack.append(frame)
+        rss_before = _max_rss_mb()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            row['Wall s'] = time.perf_counter() - wall
+            row['CPU s'] = time.thread_time() - cpu
+            row['Peak MB'] = None
+            if tracing and tracemalloc.is_tracing():
+                frame['peak'] = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                row['Peak MB'] = (frame['peak'] - frame['start_memory']) / (1024 * 1024)
+            rss_after = _max_rss_mb()
+            row['Max RSS growth MB'] = None if rss_before is None else rss_after - rss_before
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], frame['peak'])
+
+    def table(self):
+        """
+        The recorded stages in execution order, nested stages indented under their parent.
+        """
+        table = pd.DataFrame(self.rows, columns=['Stage', 'Depth', 'Wall s', 'CPU s', 'Peak MB', 'Max RSS growth MB'])
+        table['Stage'] = ['    ' * depth + name for name, depth in zip(table['Stage'], table['Depth'])]
+        return table.drop(columns='Depth')
+
+    def write_log(self):
+        """
+        Appends one JSON line per finished stage to log_path, if configured.
+        """
+        if not self.log_path or not self.rows:
+            return
+        timestamp = datetime.now(timezone.utc).isoformat()
+        common = {'timestamp': timestamp, 'page': self.page, 'run_id': self.run_id,
+                  'host': socket.gethostname(), 'pid': os.getpid(), **self.context}
+        lines = [json.dumps({**common, 'stage': row['Stage'], 'depth': row['Depth'],
+                             'wall_seconds': row.get('Wall s'), 'cpu_seconds': row.get('CPU s'),
+                             'peak_mb': row.get('Peak MB'), 'max_rss_growth_mb': row.get('Max RSS growth MB')},
+                            default=str)
+                 for row in self.rows if 'Wall s' in row]
+        with _log_lock, open(self.log_path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+def start_run(page):
+    """
+    Starts recording a page run in this thread; stage() calls anywhere below (including in
+    the engine) are attributed to it.
+    """
+    recorder = StageRecorder(page)
+    _current.recorder = recorder
+    return recorder
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a block as a stage of the current page run; a no-op when nothing is recording
+    (e.g. in the batch CLI or the benchmark suite).
+    """
+    recorder = getattr(_current, 'recorder', None)
+    if recorder is None:
+        yield
+        return
+    with recorder.stage(name):
+        yield
+
+
+def show_diagnostics(recorder):
+    """
+    Collapsible per-stage timing and memory table for this page run. The same numbers are
+    appended to the diagnostics log when SALES_DIAGNOSTICS_LOG is set.
+    """
+    recorder.write_log()
+    with st.expander("Diagnostics"):
+        table = recorder.table()
+        if table.empty:
+            st.write("No stages ran.")
+            return
+        st.dataframe(table.round(3), hide_index=True)
+        notes = ["CPU time is for the page's own thread; work in process pools shows as wall time only."]
+        if not TRACE_MEMORY:
+            notes.append("Set SALES_TRACE_MEMORY=1 to record Python peak memory per stage.")
+        st.caption(" ".join(notes))
@@ -0,0 +1,294 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import build_cube, cube_dimensions, rollup
+from cleaning import impute_missing, normalize_text, to_numeric
+from columnar_store import read_typed
+from data_cache import dataset_key
+from date_parsing import parse_dates
+from diagnostics import stage
+from forecasting import ORDER, SEASONAL_ORDER, forecast_index, preprocess_sales, run_parallel
+from model_cache import load_or_fit
+from rolling_stats import sales_trend
+from row_hashes import duplicate_mask, remember, row_hashes, seen_mask
+from schema_registry import resolve_roles
+
+# Months forecast per file by the batch runner unless --horizon is given
+FORECAST_HORIZON = 3
+
+
+def remove_duplicates(df, df_filled):
+    """
+    Drops duplicate rows from df_filled, the filled copy of df. Every row is hashed once as
+    uploaded (so the hashes do not depend on this file's medians) and those hashes drive the
+    count and the removal; rows that only become identical once their missing values are
+    filled are then found by hashing the remaining filled rows.
+    Returns the deduplicated frame, the row hashes of df, which rows of df were kept and
+    the duplicate counts.
+    """
+    hashes = row_hashes(df)
+    duplicated = duplicate_mask(hashes)
+    df_filled = df_filled[~duplicated]
+    filled_hashes = row_hashes(df_filled)
+    duplicated_filled = duplicate_mask(filled_hashes)
+    kept = ~duplicated
+    kept[kept] = ~duplicated_filled
+    return {
+        'df_filled': df_filled[~duplicated_filled],
+        'hashes': hashes,
+        'kept': kept,
+        'duplicates_before': int(duplicated.sum()),
+        'duplicates_removed': int(duplicated.sum() + duplicated_filled.sum()),
+        'duplicates_after': int(duplicate_mask(filled_hashes[~duplicated_filled]).sum()),
+    }
+
+
+def clean_dataset(df, feed=None, upload_key=None):
+    """
+    Fills missing values (median for numeric, mode for text columns) and removes duplicates.
+    With a feed name (e.g. the header fingerprint), rows stored by earlier uploads of the feed
+    are dropped as well and this upload's row hashes are stored under upload_key.
+    Returns the cleaned frame together with the details shown on the page.
+    """
+    # Median/mode imputation in one vectorized fillna pass
+    with stage('missing values'):
+        df_filled, replacement_values = impute_missing(df)
+
+        missing_after = df_filled.isnull().sum()
+
+    # Remove duplicates; the same row hashes are compared with earlier uploads
+    with stage('duplicate removal'):
+        deduplicated = remove_duplicates(df, df_filled)
+        df_filled = deduplicated['df_filled']
+        seen_before, earlier_uploads = 0, 0
+        if feed is not None:
+            hashes = deduplicated['hashes']
+            upload_key = upload_key or dataset_key(hashes.tobytes())
+            seen, earlier_uploads = seen_mask(hashes[deduplicated['kept']], feed, upload_key)
+            seen_before = int(seen.sum())
+            remember(hashes, feed, upload_key)
+            df_filled = df_filled[~seen]
+
+    return {
+        'df_filled': df_filled,
+        'replacement_values': replacement_values,
+        'missing_after': missing_after,
+        'duplicates_before': deduplicated['duplicates_before'],
+        'duplicates_after': deduplicated['duplicates_after'],
+        'duplicates_removed': deduplicated['duplicates_removed'],
+        'seen_before': seen_before,
+        'earlier_uploads': earlier_uploads,
+    }
+
+
+def analyze_dataset(df_filled):
+    """
+    Runs the uniformity check, date parsing and every Sales/Profit aggregation once.
+    The page only renders the returned results, so widget reruns never rescan the rows.
+    """
+    result = {}
+
+    # Uniformity check (example: lowercase all strings), done once per distinct value;
+    # low-cardinality text columns become categoricals
+    df_filled = normalize_text(df_filled)
+    result['uniform_head'] = df_filled.head()
+
+    # Ensure Date column is in datetime format
+    if 'Date' in df_filled.columns:
+        df_filled['Date'] = parse_dates(df_filled['Date'])
+        df_filled = df_filled.dropna(subset=['Date'])  # Drop rows with invalid/missing dates
+
+    # Find columns dynamically
+    roles = resolve_roles(df_filled.columns)
+    sales_column = roles['sales']
+    quantity_column = roles['quantity']
+    region_column = roles['region']
+    category_column = roles['category']
+    cost_column_available = 'Cost' in df_filled.columns
+    profit_column_available = 'Profit' in df_filled.columns
+    result.update(
+        sales_column=sales_column,
+        quantity_column=quantity_column,
+        region_column=region_column,
+        category_column=category_column,
+        cost_column_available=cost_column_available,
+        profit_column_available=profit_column_available,
+    )
+
+    # Clean the sales column first so Profit and every aggregate use numeric values
+    if sales_column:
+        df_filled[sales_column] = to_numeric(df_filled[sales_column])
+
+        # Drop rows with invalid sales values (NaN after conversion)
+        df_filled = df_filled.dropna(subset=[sales_column])
+
+    # Calculate profit if 'Cost' is available, or use existing 'Profit'
+    if cost_column_available and not profit_column_available:
+        df_filled['Profit'] = df_filled[sales_column] - df_filled['Cost']
+    result['has_profit'] = 'Profit' in df_filled.columns
+
+    # One scan builds the Date x Category x Region cube; every chart and the
+    # Profit/Loss card are rollups of it
+    measures = {}
+    if sales_column:
+        measures[sales_column] = sales_column
+    if result['has_profit']:
+        measures['Profit'] = 'Profit'
+    if quantity_column and pd.api.types.is_numeric_dtype(df_filled[quantity_column]):
+        measures[quantity_column] = quantity_column
+    if cost_column_available:
+        measures['Total_Cost'] = df_filled[quantity_column] * df_filled['Cost'] if quantity_column else df_filled['Cost']
+    result['cube'] = build_cube(df_filled, ['Date', category_column, region_column], measures)
+
+    # Sales Trends with Moving Average: rolling statistics over calendar days, computed from
+    # the cube's daily totals rather than over individual rows
+    result['trend'] = None
+    if 'Date' in df_filled.columns and sales_column:
+        df_filled = df_filled.sort_values(by='Date')  # Sort by date
+        result['trend'] = sales_trend(rollup(result['cube'], 'Date', [sales_column]), 'Date', sales_column)
+
+    result['frame'] = df_filled
+    return result
+
+
+def aggregate_tables(analysis):
+    """
+    The rollups the EDA page charts: one table per cube dimension (date, category, region),
+    keyed by a file-friendly name such as "by_date".
+    """
+    cube = analysis['cube']
+    return {f"by_{str(dimension).lower().replace(' ', '_').replace('-', '_')}": rollup(cube, dimension, list(cube.columns))
+            for dimension in cube_dimensions(cube)}
+
+
+def write_aggregates(analysis, output_dir):
+    """
+    Writes aggregate_tables and the overall totals as CSV files.
+    Returns the names of the files written.
+    """
+    written = []
+    for name, table in aggregate_tables(analysis).items():
+        table.to_csv(os.path.join(output_dir, f"{name}.csv"), index=False)
+        written.append(f"{name}.csv")
+    rollup(analysis['cube']).to_frame('Total').to_csv(os.path.join(output_dir, 'totals.csv'))
+    written.append('totals.csv')
+    return written
+
+
+def forecast_sales(frame, sales_column, steps, order=ORDER, seasonal_order=SEASONAL_ORDER):
+    """
+    Forecasts total sales `steps` months ahead with the forecasting page's preprocessing and
+    model cache. Returns a frame with Date and Forecast columns.
+    """
+    series = preprocess_sales(frame[['Date', sales_column]].rename(columns={sales_column: 'Sales'}))['Sales']
+    results, _ = load_or_fit(series, order=order, seasonal_order=seasonal_order)
+    return pd.DataFrame({'Date': forecast_index(series.index[-1], steps),
+                         'Forecast': np.asarray(np.expm1(results.forecast(steps=steps)))})
+
+
+def analyze_file(path, output_dir, horizon=FORECAST_HORIZON):
+    """
+    Runs the whole pipeline on one CSV without Streamlit: cleaning, column detection,
+    aggregation and (when there are Date and sales columns) a forecast. Results go to
+    output_dir/<file name>/; the returned dict summarizes the run and is also written there
+    as summary.json. Raises on unreadable files; run_batch records that as a failure.
+    """
+    timings = {}
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        df = read_typed(f.read())
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cleaned = clean_dataset(df)
+    timings['clean'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analysis = analyze_dataset(cleaned['df_filled'])
+    timings['analyze'] = time.perf_counter() - start
+
+    target = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0])
+    os.makedirs(target, exist_ok=True)
+    files = write_aggregates(analysis, target)
+
+    summary = {
+        'file': path,
+        'rows': len(df),
+        'duplicates_removed': cleaned['duplicates_removed'],
+        'sales_column': analysis['sales_column'],
+        'quantity_column': analysis['quantity_column'],
+        'region_column': analysis['region_column'],
+        'category_column': analysis['category_column'],
+        'forecast': None,
+    }
+    if analysis['sales_column'] and 'Date' in analysis['frame'].columns:
+        start = time.perf_counter()
+        try:
+            forecast_sales(analysis['frame'], analysis['sales_column'], horizon).to_csv(
+                os.path.join(target, 'forecast.csv'), index=False)
+            files.append('forecast.csv')
+            summary['forecast'] = 'ok'
+        except Exception as e:
+            # A series too short or irregular to model still leaves the aggregates usable
+            summary['forecast'] = f"failed: {e}"
+        timings['forecast'] = time.perf_counter() - start
+
+    summary['files'] = files
+    summary['seconds'] = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+    with open(os.path.join(target, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+
+def run_batch(input_dir, output_dir, pattern='*.csv', horizon=FORECAST_HORIZON, workers=None, progress=None):
+    """
+    Analyzes every CSV in input_dir matching pattern on a process pool and writes one folder
+    of results per file plus batch_summary.csv. A file that fails does not stop the others.
+    Returns the batch summary frame.
+    """
+    paths = sorted(glob.glob(os.path.join(input_dir, pattern)))
+    os.makedirs(output_dir, exist_ok=True)
+    rows = []
+    for index, summary, error in run_parallel(analyze_file, [(path, output_dir, horizon) for path in paths], workers):
+        if error is not None:
+            summary = {'file': paths[index], 'error': str(error) or type(error).__name__}
+        rows.append({'File': os.path.basename(summary['file']), 'Status': 'failed' if 'error' in summary else 'ok',
+                     'Rows': summary.get('rows'), 'Forecast': summary.get('forecast'),
+                     'Seconds': sum(summary.get('seconds', {}).values()), 'Error': summary.get('error', '')})
+        if progress is not None:
+            progress(rows[-1])
+    batch = pd.DataFrame(rows, columns=['File', 'Status', 'Rows', 'Forecast', 'Seconds', 'Error'])
+    batch = batch.sort_values('File', ignore_index=True)
+    batch.to_csv(os.path.join(output_dir, 'batch_summary.csv'), index=False)
+    return batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Precompute the EDA aggregates and sales forecasts for a directory of CSV files.")
+    parser.add_argument('input_dir', help="directory containing the CSV files")
+    parser.add_argument('output_dir', help="directory to write one result folder per file into")
+    parser.add_argument('--pattern', default='*.csv', help="file name pattern (default: *.csv)")
+    parser.add_argument('--horizon', type=int, default=FORECAST_HORIZON, help="months to forecast")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    batch = run_batch(args.input_dir, args.output_dir, args.pattern, args.horizon, args.workers,
+                      progress=lambda row: print(f"{row['Status']:>6}  {row['File']}  {row['Seconds']:.1f} s"
+                                                 + (f"  {row['Error']}" if row['Error'] else ''), flush=True))
+    failed = int((batch['Status'] != 'ok').sum())
+    print(f"{len(batch)} files in {time.perf_counter() - start:.1f} s, {failed} failed; "
+          f"summary in {os.path.join(args.output_dir, 'batch_summary.csv')}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+from aggregates import ROWS, build_cube, merge_cubes
+from cleaning import to_numeric
+from date_parsing import parse_dates
+from streaming import DEFAULT_CHUNKSIZE, iter_chunks, read_header
+
+# Directory the Tableau extracts are written to (point the dashboard's data source here)
+EXPORT_DIR = os.environ.get(
+    "SALES_EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".extracts"))
+
+# Data rows read to validate an upload before anything else is parsed
+VALIDATION_SAMPLE_ROWS = 1000
+
+# Share of sampled values that must parse for a date/amount column to be accepted
+VALID_SHARE = 0.95
+
+
+def validate_sample(source, required_columns, date_column='Date', amount_column='Amount', encoding='utf-8',
+                    sample_rows=VALIDATION_SAMPLE_ROWS):
+    """
+    Reads only the header and the first sample_rows rows and checks that the required
+    columns exist and that the sampled dates and amounts parse. Returns (sample, problems);
+    an empty problem list means the file can be used.
+    """
+    sample = read_header(source, encoding=encoding, nrows=sample_rows)
+    missing = [col for col in required_columns if col not in sample.columns]
+    if missing:
+        return sample, [f"Missing required column(s): {', '.join(missing)}"]
+
+    problems = []
+    if date_column in sample.columns:
+        present = sample[date_column].dropna()
+        if len(present) and parse_dates(present).notna().mean() < VALID_SHARE:
+            problems.append(f"Column {date_column} does not look like dates, e.g. {present.iloc[0]!r}")
+    if amount_column in sample.columns:
+        present = sample[amount_column].dropna()
+        if len(present) and to_numeric(present).notna().mean() < VALID_SHARE:
+            problems.append(f"Column {amount_column} does not look numeric, e.g. {present.iloc[0]!r}")
+    return sample, problems
+
+
+def build_extract(source, dimensions, measures, date_column='Date', encoding='utf-8', chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Streams the CSV in chunks, reading only the dimension and measure columns, and sums the
+    measures (plus the row count) per combination of dimensions, e.g. date x order x region.
+    Memory is bounded by one chunk plus the aggregate. Returns a flat, typed frame: dates as
+    datetime, text dimensions as categoricals, measures as numbers.
+    """
+    dimensions = [col for col in dict.fromkeys(dimensions) if col]
+    cube = None
+    for chunk in iter_chunks(source, chunksize=chunksize, encoding=encoding, usecols=dimensions + list(measures)):
+        if date_column in chunk.columns:
+            chunk[date_column] = parse_dates(chunk[date_column], date_column)
+        for col in measures:
+            chunk[col] = to_numeric(chunk[col])
+        cube = merge_cubes(cube, build_cube(chunk, dimensions, {col: col for col in measures}))
+    if cube is None:
+        raise ValueError("The uploaded file does not contain any rows.")
+
+    extract = cube.reset_index()
+    for col in dimensions:
+        if extract[col].dtype == object:
+            extract[col] = extract[col].astype('category')
+    extract[ROWS] = extract[ROWS].astype('int64')
+    return extract.sort_values([col for col in dimensions if col in extract.columns], ignore_index=True)
+
+
+def write_extract(extract, name):
+    """
+    Writes the extract as zstd-compressed Parquet into EXPORT_DIR, renaming into place so
+    the dashboard never reads a half-written file. Returns the path.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{name}.parquet")
+    fd, tmp_path = tempfile.mkstemp(dir=EXPORT_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        extract.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+        # Readable by the dashboard's service account (mkstemp creates owner-only files)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
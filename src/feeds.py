@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from aggregates import cube_dimensions, merge_cubes
+from engine import analyze_dataset, clean_dataset
+
+# Directory holding, per feed (CSV header), the running aggregates and the upload log
+FEED_DIR = os.environ.get(
+    "SALES_FEED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".feeds"))
+
+_lock = threading.Lock()
+
+
+def _feed_dir(feed):
+    return os.path.join(FEED_DIR, feed)
+
+
+def _state_path(feed):
+    return os.path.join(_feed_dir(feed), 'state.json')
+
+
+def feed_state(feed):
+    """
+    The feed's upload log, column types and totals, or None before its first append.
+    """
+    if not os.path.exists(_state_path(feed)):
+        return None
+    with open(_state_path(feed)) as f:
+        return json.load(f)
+
+
+def load_feed_cube(feed, state=None):
+    """
+    The feed's Date x Category x Region cube, summed over every appended upload.
+    """
+    state = state if state is not None else feed_state(feed)
+    if state is None:
+        return None
+    flat = pd.read_parquet(os.path.join(_feed_dir(feed), state['cube_file']))
+    return flat.set_index(state['dimensions']) if state['dimensions'] else flat
+
+
+def _kind(dtype):
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+        return 'text'
+    return 'number'
+
+
+def check_append(state, df):
+    """
+    Raises ValueError unless the new rows have the feed's columns, each with the same kind
+    of values (number, date or text) as before.
+    """
+    expected = state['columns']
+    if list(df.columns) != list(expected):
+        missing = [col for col in expected if col not in df.columns]
+        extra = [col for col in df.columns if col not in expected]
+        raise ValueError(f"The new rows do not match this feed's columns (missing: {missing or 'none'}, "
+                         f"unexpected: {extra or 'none'}).")
+    changed = [f"{col} ({expected[col]} -> {_kind(df[col].dtype)})" for col in expected
+               if _kind(df[col].dtype) != expected[col] and df[col].notna().any()]
+    if changed:
+        raise ValueError(f"Column types changed since the last append: {', '.join(changed)}.")
+
+
+def _write(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def append_rows(feed, upload_key, df):
+    """
+    Adds one upload of new rows to the feed: the rows are validated against the feed's
+    columns, cleaned (dropping rows any earlier append already counted) and aggregated on
+    their own, and their cube is added to the stored one. The cost depends only on the new
+    rows. Appending the same upload twice changes nothing.
+    Returns (cube, state, appended) where appended is False for a repeated upload.
+    """
+    with _lock:
+        state = feed_state(feed)
+        if state is not None and any(upload['key'] == upload_key for upload in state['uploads']):
+            return load_feed_cube(feed, state), state, False
+        if state is not None:
+            check_append(state, df)
+
+        # Row hashes are kept apart from the EDA page's own deduplication of the same header
+        cleaned = clean_dataset(df, feed=f"{feed}-appended", upload_key=upload_key)
+        analysis = analyze_dataset(cleaned['df_filled'])
+        part = analysis['cube']
+
+        total = None
+        if state is not None:
+            if cube_dimensions(part) != state['dimensions']:
+                raise ValueError("The new rows group into different dimensions than this feed's aggregates.")
+            total = load_feed_cube(feed, state)
+        cube = merge_cubes(total, part)
+
+        added = len(cleaned['df_filled'])
+        state = state or {
+            'columns': {col: _kind(df[col].dtype) for col in df.columns},
+            'roles': {role: analysis[f'{role}_column'] for role in ('sales', 'quantity', 'region', 'category')},
+            'has_profit': analysis['has_profit'],
+            'dimensions': cube_dimensions(part),
+            'rows': 0,
+            'uploads': [],
+        }
+        old_cube_file = state.get('cube_file')
+        state = {
+            **state,
+            'rows': state['rows'] + added,
+            'cube_file': f"cube-{uuid.uuid4().hex[:12]}.parquet",
+            'uploads': state['uploads'] + [{
+                'key': upload_key,
+                'appended': datetime.now(timezone.utc).isoformat(),
+                'rows_received': len(df),
+                'rows_added': added,
+                'duplicates': cleaned['duplicates_before'],
+                'already_appended': cleaned['seen_before'],
+            }],
+        }
+
+        # The new cube goes to a new file and the state switches to it in one rename, so
+        # readers always see a cube and a state that belong together
+        os.makedirs(_feed_dir(feed), exist_ok=True)
+        _write(os.path.join(_feed_dir(feed), state['cube_file']),
+               lambda path: cube.reset_index().to_parquet(path, engine='pyarrow', compression='zstd', index=False))
+
+        def write_state(path):
+            with open(path, 'w') as f:
+                json.dump(state, f, indent=2, default=str)
+        _write(_state_path(feed), write_state)
+        if old_cube_file:
+            os.remove(os.path.join(_feed_dir(feed), old_cube_file))
+    return cube, state, True
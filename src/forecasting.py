@@ -0,0 +1,473 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from statsmodels.tools.sm_exceptions import InterpolationWarning
+from statsmodels.tsa.seasonal import STL
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from statsmodels.tsa.stattools import kpss
+
+from date_parsing import parse_dates
+from model_cache import load_or_fit
+
+# Default SARIMA specification used by the forecasting page
+ORDER = (2, 1, 2)
+SEASONAL_ORDER = (1, 1, 1, 12)
+
+# Seconds a single segment may spend fitting before it is reported as timed out
+SEGMENT_TIME_LIMIT = float(os.environ.get("SALES_SEGMENT_TIME_LIMIT", "60"))
+
+# Order search: seconds per candidate fit, optimizer iterations for the quick ranking pass,
+# and how many candidates get a full fit after pruning
+FIT_TIME_LIMIT = float(os.environ.get("SALES_FIT_TIME_LIMIT", "20"))
+QUICK_MAXITER = 15
+SEARCH_KEEP = 5
+
+# Differencing tests: seasonal strength above which the series is differenced seasonally
+# (Wang, Smith & Hyndman) and the KPSS p-value below which it is differenced once more
+SEASONAL_STRENGTH_THRESHOLD = 0.64
+KPSS_ALPHA = 0.05
+
+
+def preprocess_sales(df):
+    """
+    Turns the raw upload into the log-transformed Sales series indexed by Date.
+    Raises ValueError with a user-facing message when the data cannot be used.
+    """
+    df = df.copy()
+
+    # Format inferred from the data (month-first wins on ambiguous dates), each date parsed once
+    try:
+        df['Date'] = parse_dates(df['Date'])
+    except Exception as e:
+        raise ValueError(f'Error parsing dates: {e}')
+
+    # Drop rows where Date parsing failed
+    df.dropna(subset=['Date'], inplace=True)
+    if df.empty:
+        raise ValueError('No valid dates found in the "Date" column.')
+    df.set_index('Date', inplace=True)
+    df = df.sort_index()
+
+    # Preprocessing: Log transform the sales data to stabilize variance
+    # Convert 'Sales' to numeric, coercing errors to NaN
+    # Remove commas, dollar signs, and other non-numeric characters
+    if df['Sales'].dtype == object:
+        df['Sales'] = df['Sales'].replace({',': '', r'\$': '', ' ': ''}, regex=True)
+
+    # Convert to numeric, handling errors
+    df['Sales'] = pd.to_numeric(df['Sales'], errors='coerce')
+
+    # Remove duplicates and resample to monthly totals if spanning years
+    df = df.groupby(df.index).sum()
+    if (df.index[-1] - df.index[0]).days > 365:
+        df = df.resample('M').sum()  # Resample to monthly frequency for clarity
+
+    # Drop rows with invalid or missing Sales values
+    df.dropna(subset=['Sales'], inplace=True)
+
+    # Log transform the sales data to stabilize variance
+    df['Sales'] = np.log1p(df['Sales'])  # log1p to handle zero values
+    if df['Sales'].isnull().any():
+        raise ValueError("Sales column contains invalid values even after cleaning. Please check your data.")
+    return df
+
+
+def forecast_index(last_date, steps):
+    """
+    Month-end dates for the forecast, starting the month after the last observation.
+    """
+    return pd.date_range(last_date + pd.DateOffset(months=1), periods=steps, freq='M')
+
+
+class SegmentTimeout(Exception):
+    pass
+
+
+@contextmanager
+def _time_limit(seconds):
+    # SIGALRM only exists on Unix and only works in the main thread, which is where pool
+    # workers run their tasks; elsewhere the overall deadline is the only limit
+    if not seconds or not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _raise(signum, frame):
+        raise SegmentTimeout(f"fit exceeded {seconds:g} s")
+
+    previous = signal.signal(signal.SIGALRM, _raise)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def forecast_segment(segment, frame, steps, order=ORDER, seasonal_order=SEASONAL_ORDER, time_limit=SEGMENT_TIME_LIMIT):
+    """
+    Preprocesses and forecasts one segment. Never raises: failures and timeouts are
+    returned in the status row so one bad segment cannot stop the batch.
+    """
+    start = time.perf_counter()
+    status = {'Segment': segment, 'Status': 'ok', 'Observations': 0, 'Seconds': 0.0, 'Error': ''}
+    forecast = None
+    try:
+        series = preprocess_sales(frame)['Sales']
+        status['Observations'] = len(series)
+        # The seasonal differences need at least two full seasons of history
+        if len(series) < 2 * seasonal_order[3] + sum(order):
+            raise ValueError(f"only {len(series)} observations")
+        with _time_limit(time_limit):
+            results, _ = load_or_fit(series, order=order, seasonal_order=seasonal_order)
+            values = np.expm1(results.forecast(steps=steps))
+        forecast = pd.DataFrame({'Segment': segment, 'Date': forecast_index(series.index[-1], steps),
+                                 'Forecast': np.asarray(values)})
+    except SegmentTimeout as e:
+        status.update(Status='timeout', Error=str(e))
+    except Exception as e:
+        status.update(Status='failed', Error=str(e))
+    status['Seconds'] = round(time.perf_counter() - start, 3)
+    return forecast, status
+
+
+def split_segments(df, segment_column):
+    """
+    Splits the Date/Sales frame into one frame per segment. Dates are parsed once for the
+    whole file, so the workers only group and resample.
+    """
+    df = df[['Date', 'Sales', segment_column]].copy()
+    df['Date'] = parse_dates(df['Date'])
+    return {segment: group[['Date', 'Sales']]
+            for segment, group in df.groupby(segment_column, observed=True, sort=True)}
+
+
+def pool_context():
+    # fork starts workers instantly and does not re-import the Streamlit script
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def run_parallel(function, tasks, max_workers=None, deadline=None):
+    """
+    Calls function(*task) for every task on a process pool and yields (index, result, error)
+    as tasks finish. A task that raised (or whose worker crashed) has error set; tasks not
+    finished when the deadline (seconds) passes are yielded with a FutureTimeout error.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tasks) <= 1:
+        # Not worth starting processes for a single worker or a single task
+        start = time.perf_counter()
+        for index, task in enumerate(tasks):
+            if deadline is not None and time.perf_counter() - start > deadline:
+                yield index, None, FutureTimeout(f"deadline of {deadline:g} s passed")
+                continue
+            try:
+                yield index, function(*task), None
+            except Exception as e:
+                yield index, None, e
+        return
+
+    executor = ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), mp_context=pool_context())
+    futures = {executor.submit(function, *task): index for index, task in enumerate(tasks)}
+    finished = set()
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            finished.add(futures[future])
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+    except FutureTimeout:
+        for future, index in futures.items():
+            if index not in finished:
+                future.cancel()
+                yield index, None, FutureTimeout(f"deadline of {deadline:g} s passed")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def forecast_segments(df, segment_column, steps, order=ORDER, seasonal_order=SEASONAL_ORDER,
+                      max_workers=None, time_limit=SEGMENT_TIME_LIMIT, deadline=None, progress=None):
+    """
+    Fits one model per value of segment_column on a process pool and returns
+    (forecasts, summary): the combined forecast table (Segment, Date, Forecast) and one status
+    row per segment. Segments still running when the overall deadline (seconds) passes are
+    reported as timed out. progress, if given, is called with (done, total) as segments finish.
+    """
+    segments = split_segments(df, segment_column)
+    tasks = [(segment, frame, steps, order, seasonal_order, time_limit) for segment, frame in segments.items()]
+
+    forecasts, statuses = [], []
+    for index, result, error in run_parallel(forecast_segment, tasks, max_workers, deadline):
+        if error is not None:
+            # A crashed worker or the batch deadline only loses the segments involved
+            result = (None, {'Segment': tasks[index][0], 'Observations': 0, 'Seconds': 0.0,
+                             'Status': 'timeout' if isinstance(error, FutureTimeout) else 'failed',
+                             'Error': str(error) or type(error).__name__})
+        forecast, status = result
+        statuses.append(status)
+        if forecast is not None:
+            forecasts.append(forecast)
+        if progress is not None:
+            progress(len(statuses), len(tasks))
+
+    columns = ['Segment', 'Date', 'Forecast']
+    if forecasts:
+        forecasts = pd.concat(forecasts, ignore_index=True).sort_values(['Segment', 'Date'], ignore_index=True)
+    else:
+        forecasts = pd.DataFrame(columns=columns)
+    summary = pd.DataFrame(statuses, columns=['Segment', 'Status', 'Observations', 'Seconds', 'Error'])
+    return forecasts, summary.sort_values('Segment', ignore_index=True)
+
+
+def choose_differencing(series, period=SEASONAL_ORDER[3], max_d=1, max_D=1):
+    """
+    Picks the differencing orders (d, D) from tests on the series instead of from model
+    fits: D = 1 when the seasonal strength of an STL decomposition exceeds
+    SEASONAL_STRENGTH_THRESHOLD, then d = 1 when a KPSS test rejects stationarity of the
+    (seasonally differenced) series at KPSS_ALPHA.
+    """
+    values = pd.Series(np.asarray(series, dtype=float)).dropna()
+    D = 0
+    if max_D and len(values) >= 2 * period + 1:
+        decomposition = STL(values, period=period, robust=True).fit()
+        remainder = decomposition.resid
+        strength = 1 - np.var(remainder) / max(np.var(decomposition.seasonal + remainder), 1e-12)
+        D = int(strength > SEASONAL_STRENGTH_THRESHOLD)
+    if D:
+        values = values.diff(period).dropna()
+    d = 0
+    if max_d and len(values) >= 8 and values.std() > 0:
+        with warnings.catch_warnings():
+            # KPSS p-values are interpolated from a table and clipped at its ends
+            warnings.simplefilter('ignore', InterpolationWarning)
+            d = int(kpss(values, regression='c', nlags='auto')[1] < KPSS_ALPHA)
+    return d, D
+
+
+def candidate_orders(max_p=2, max_d=1, max_q=2, max_P=1, max_D=1, max_Q=1, period=SEASONAL_ORDER[3],
+                     d=None, D=None):
+    """
+    Every (order, seasonal_order) in the bounded grid, simplest models first. Passing d or D
+    fixes that differencing order instead of varying it up to max_d / max_D.
+    """
+    d_values = range(max_d + 1) if d is None else [d]
+    D_values = range(max_D + 1) if D is None else [D]
+    candidates = [((p, d_, q), (P, D_, Q, period))
+                  for p in range(max_p + 1) for d_ in d_values for q in range(max_q + 1)
+                  for P in range(max_P + 1) for D_ in D_values for Q in range(max_Q + 1)]
+    return sorted(candidates, key=lambda spec: (sum(spec[0]) + sum(spec[1][:3]), spec))
+
+
+def _min_observations(order, seasonal_order):
+    p, d, q = order
+    P, D, Q, s = seasonal_order
+    return d + D * s + max(p + P * s, q + Q * s) + 2
+
+
+def score_candidate(series, order, seasonal_order, criterion='aic', holdout=12, maxiter=50, time_limit=None):
+    """
+    Fits one candidate and scores it: AIC, or RMSE (in sales units) of a forecast over the
+    last `holdout` observations when criterion is 'holdout'. Lower is better. Never raises.
+    """
+    start = time.perf_counter()
+    row = {'Order': order, 'Seasonal Order': seasonal_order, 'Score': np.nan, 'Converged': False,
+           'Status': 'ok', 'Error': '', 'Seconds': 0.0}
+    train = series.iloc[:-holdout] if criterion == 'holdout' else series
+    if len(train) < _min_observations(order, seasonal_order):
+        row.update(Status='skipped', Error=f"needs more than {len(train)} observations")
+        return row
+    try:
+        with _time_limit(time_limit):
+            results = SARIMAX(train, order=order, seasonal_order=seasonal_order).fit(disp=False, maxiter=maxiter)
+            if criterion == 'holdout':
+                predicted = np.expm1(np.asarray(results.forecast(steps=holdout)))
+                actual = np.expm1(series.iloc[-holdout:].to_numpy())
+                score = float(np.sqrt(np.mean((predicted - actual) ** 2)))
+            else:
+                score = float(results.aic)
+        if not np.isfinite(score):
+            raise ValueError("score is not finite")
+        row.update(Score=score, Converged=bool(results.mle_retvals.get('converged', True)))
+    except SegmentTimeout as e:
+        row.update(Status='timeout', Error=str(e))
+    except Exception as e:
+        row.update(Status='failed', Error=str(e))
+    row['Seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def search_orders(series, criterion='aic', candidates=None, budget=120.0, fit_time_limit=FIT_TIME_LIMIT,
+                  quick_maxiter=QUICK_MAXITER, keep=SEARCH_KEEP, holdout=12, max_workers=None, progress=None):
+    """
+    Picks the SARIMA specification with the lowest AIC or holdout RMSE.
+
+    AIC values are only comparable between models fitted to the same differenced series, so
+    with criterion 'aic' the default grid fixes d and D with choose_differencing and varies
+    only p, q, P and Q. Holdout errors are in sales units for every model, so the 'holdout'
+    grid varies d and D as well.
+
+    Every candidate first gets a quick fit (few optimizer iterations) in parallel. Candidates
+    that are clearly worse than the best quick score (more than 10 AIC points, or 25% higher
+    holdout error) are pruned, and at most `keep` survivors are fitted to convergence. Fits
+    over fit_time_limit seconds are stopped, and the whole search stops after `budget` seconds.
+
+    Returns a dict with the winning order, seasonal_order and score, the tested (d, D) if
+    any, the search time, and a table of every candidate's stage, score and status. Raises ValueError if no candidate fits.
+    """
+    start = time.perf_counter()
+    differencing = None
+    if candidates is None:
+        if criterion == 'aic':
+            differencing = choose_differencing(series)
+            candidates = candidate_orders(d=differencing[0], D=differencing[1])
+        else:
+            candidates = candidate_orders()
+    holdout = min(holdout, max(len(series) // 4, 1))
+    rows = []
+
+    def run_stage(stage, specs, maxiter):
+        remaining = max(budget - (time.perf_counter() - start), 0)
+        tasks = [(series, order, seasonal_order, criterion, holdout, maxiter, fit_time_limit)
+                 for order, seasonal_order in specs]
+        results = []
+        for index, row, error in run_parallel(score_candidate, tasks, max_workers, remaining):
+            if error is not None:
+                order, seasonal_order = specs[index]
+                row = {'Order': order, 'Seasonal Order': seasonal_order, 'Score': np.nan, 'Converged': False,
+                       'Status': 'timeout' if isinstance(error, FutureTimeout) else 'failed',
+                       'Error': str(error) or type(error).__name__, 'Seconds': 0.0}
+            row['Stage'] = stage
+            results.append(row)
+            rows.append(row)
+            if progress is not None:
+                progress(stage, len(results), len(tasks))
+        return [row for row in results if row['Status'] == 'ok']
+
+    # Stage 1: cheap fits rank every candidate
+    quick = sorted(run_stage('quick', candidates, quick_maxiter), key=lambda row: row['Score'])
+    if not quick:
+        raise ValueError("No SARIMA candidate could be fitted to this series.")
+    best = quick[0]['Score']
+    limit = best + 10 if criterion == 'aic' else best * 1.25
+    survivors = [row for row in quick if row['Score'] <= limit][:keep]
+    for row in quick[len(survivors):]:
+        row['Status'] = 'pruned'
+
+    # Stage 2: full fits for the survivors only
+    full = run_stage('full', [(row['Order'], row['Seasonal Order']) for row in survivors], maxiter=200)
+    winner = min(full or survivors, key=lambda row: row['Score'])
+
+    table = pd.DataFrame(rows, columns=['Stage', 'Order', 'Seasonal Order', 'Score', 'Converged', 'Status', 'Seconds', 'Error'])
+    table['Order'] = table['Order'].astype(str)
+    table['Seasonal Order'] = table['Seasonal Order'].astype(str)
+    return {
+        'order': winner['Order'],
+        'seasonal_order': winner['Seasonal Order'],
+        'score': winner['Score'],
+        'criterion': criterion,
+        'differencing': differencing,
+        'seconds': time.perf_counter() - start,
+        'candidates': table.sort_values(['Stage', 'Score'], ignore_index=True),
+    }
+
+
+def forecast_errors(actual, predicted):
+    """
+    MAPE and sMAPE (in %) and RMSE of forecasts against actuals, along the last axis.
+    Periods with zero actual sales are left out of MAPE.
+    """
+    actual, predicted = np.asarray(actual, dtype=float), np.asarray(predicted, dtype=float)
+    error = predicted - actual
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(actual != 0, np.abs(error) / np.abs(actual), np.nan)
+        sape = 2 * np.abs(error) / (np.abs(actual) + np.abs(predicted))
+        return {
+            'MAPE': 100 * np.nanmean(ape, axis=-1),
+            'sMAPE': 100 * np.nanmean(sape, axis=-1),
+            'RMSE': np.sqrt(np.mean(error ** 2, axis=-1)),
+        }
+
+
+def backtest_block(series, cutoffs, horizon, order=ORDER, seasonal_order=SEASONAL_ORDER):
+    """
+    Evaluates consecutive cutoffs (training lengths) with one model: it is fitted at the
+    first cutoff and, for the later ones, only extended with the extra observations, keeping
+    its parameters. Returns one row per cutoff with the forecasts and wall times.
+    """
+    rows = []
+    results = None
+    for cutoff in cutoffs:
+        start = time.perf_counter()
+        if results is None:
+            results = SARIMAX(series.iloc[:cutoff], order=order, seasonal_order=seasonal_order).fit(disp=False)
+            refit = True
+        else:
+            results = results.append(series.iloc[previous:cutoff], refit=False)
+            refit = False
+        fit_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        predicted = np.asarray(results.forecast(steps=horizon))
+        rows.append({'Cutoff': series.index[cutoff - 1], 'Refit': refit, 'Fit Seconds': fit_seconds,
+                     'Forecast Seconds': time.perf_counter() - start, 'Predicted': predicted,
+                     'Actual': series.iloc[cutoff:cutoff + horizon].to_numpy()})
+        previous = cutoff
+    return rows
+
+
+def backtest(series, order=ORDER, seasonal_order=SEASONAL_ORDER, horizon=3, n_cutoffs=12, step=1,
+             refit_every=4, max_workers=None):
+    """
+    Rolling-origin evaluation of a specification on a log-transformed Sales series: forecasts
+    `horizon` periods from each of the last n_cutoffs origins (`step` periods apart).
+    Blocks of refit_every consecutive cutoffs share one fitted model and run in parallel.
+
+    Returns (per_cutoff, by_horizon, summary). per_cutoff has MAPE/sMAPE/RMSE and the fit and
+    forecast wall times for each cutoff; by_horizon has the same errors for each step ahead
+    across all cutoffs. Errors are measured in sales units. Raises ValueError when the series
+    is too short for the requested cutoffs.
+    """
+    cutoffs = sorted(len(series) - horizon - step * i for i in range(n_cutoffs))
+    if not cutoffs or cutoffs[0] < _min_observations(order, seasonal_order):
+        raise ValueError("The series is too short for this many cutoffs; reduce the cutoffs or the horizon.")
+
+    start = time.perf_counter()
+    blocks = [cutoffs[i:i + refit_every] for i in range(0, len(cutoffs), refit_every)]
+    tasks = [(series, block, horizon, order, seasonal_order) for block in blocks]
+    rows = []
+    for index, block_rows, error in run_parallel(backtest_block, tasks, max_workers):
+        if error is not None:
+            raise ValueError(f"Backtest failed for cutoffs starting at {series.index[blocks[index][0] - 1]:%Y-%m-%d}: {error}")
+        rows.extend(block_rows)
+    rows.sort(key=lambda row: row['Cutoff'])
+
+    # Forecast and actual matrices (cutoffs x horizon) in sales units
+    predicted = np.expm1(np.vstack([row['Predicted'] for row in rows]))
+    actual = np.expm1(np.vstack([row['Actual'] for row in rows]))
+
+    per_cutoff = pd.DataFrame({
+        'Cutoff': [row['Cutoff'] for row in rows],
+        **forecast_errors(actual, predicted),
+        'Refit': [row['Refit'] for row in rows],
+        'Fit Seconds': [row['Fit Seconds'] for row in rows],
+        'Forecast Seconds': [row['Forecast Seconds'] for row in rows],
+    })
+    by_horizon = pd.DataFrame({'Horizon': np.arange(1, horizon + 1), **forecast_errors(actual.T, predicted.T)})
+    summary = {
+        **{name: float(values) for name, values in forecast_errors(actual.ravel(), predicted.ravel()).items()},
+        'cutoffs': len(rows),
+        'fit_seconds': float(per_cutoff['Fit Seconds'].sum()),
+        'forecast_seconds': float(per_cutoff['Forecast Seconds'].sum()),
+        'wall_seconds': time.perf_counter() - start,
+    }
+    return per_cutoff, by_horizon, summary
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from date_parsing import parse_dates
+from streaming import DEFAULT_CHUNKSIZE, iter_chunks, read_header
+
+# Unmatched keys listed in the join report (the counts always cover all of them)
+UNMATCHED_SAMPLE = 20
+
+
+def _align_key(values, like):
+    # Supplementary keys arrive as CSV text; give them the main column's type so that
+    # "00123" vs 123 or "01/02/2020" vs a parsed date still match
+    if pd.api.types.is_datetime64_any_dtype(like.dtype):
+        return parse_dates(values)
+    if pd.api.types.is_numeric_dtype(like.dtype):
+        return pd.to_numeric(values, errors='coerce')
+    return _text_key(values)
+
+
+def _text_key(values):
+    # Missing keys stay missing, so they factorize to -1 and never match each other
+    return values.where(values.isna(), values.astype(str).str.strip())
+
+
+def _key_index(frame, keys):
+    if len(keys) == 1:
+        return pd.Index(frame[keys[0]])
+    return pd.MultiIndex.from_frame(frame[keys])
+
+
+def join_supplementary(df, source, keys, columns, chunksize=DEFAULT_CHUNKSIZE, encoding='latin1'):
+    """
+    Adds `columns` of a supplementary CSV to df by matching on the key columns (e.g. Order_ID,
+    or SKU and Date) instead of by row position. The distinct keys of df form a hash index;
+    the supplementary file is streamed in chunks of only the key and wanted columns and each
+    chunk is probed against the index, so memory stays bounded by df plus one chunk however
+    large the supplementary file is. A key listed more than once keeps its last values.
+    Returns (joined frame, report) where the report counts matched and unmatched keys on
+    both sides with a sample of each.
+    """
+    keys = list(keys)
+    columns = [col for col in columns if col not in keys]
+    header = read_header(source, encoding=encoding)
+    missing = [col for col in keys + columns if col not in header.columns]
+    if missing:
+        raise ValueError(f"The supplementary file has no column(s): {', '.join(missing)}")
+    missing = [col for col in keys if col not in df.columns]
+    if missing:
+        raise ValueError(f"The main dataset has no key column(s): {', '.join(missing)}")
+
+    main_keys = df[keys].copy()
+    for key in keys:
+        if not (pd.api.types.is_numeric_dtype(main_keys[key].dtype)
+                or pd.api.types.is_datetime64_any_dtype(main_keys[key].dtype)):
+            main_keys[key] = _text_key(main_keys[key])
+    # codes maps every row of df to its distinct key (-1 for a missing key), so repeated
+    # keys are looked up once
+    codes, distinct = _key_index(main_keys, keys).factorize()
+
+    values = {col: np.full(len(distinct), np.nan, dtype=object) for col in columns}
+    found = np.zeros(len(distinct), dtype=bool)
+    supplementary_rows = 0
+    unmatched_count = 0
+    unmatched_sample = []
+
+    for chunk in iter_chunks(source, chunksize=chunksize, encoding=encoding, usecols=keys + columns):
+        supplementary_rows += len(chunk)
+        for key in keys:
+            chunk[key] = _align_key(chunk[key], main_keys[key])
+        positions = distinct.get_indexer(_key_index(chunk, keys))
+        matched = positions >= 0
+        unmatched_count += int((~matched).sum())
+        if len(unmatched_sample) < UNMATCHED_SAMPLE and not matched.all():
+            unmatched_sample += chunk.loc[~matched, keys].head(UNMATCHED_SAMPLE - len(unmatched_sample)).to_dict('records')
+        hit = positions[matched]
+        found[hit] = True
+        for col in columns:
+            values[col][hit] = chunk[col].to_numpy(dtype=object)[matched]
+
+    joined = df.copy()
+    for col in columns:
+        # Back to a numeric dtype when the supplementary values are numbers (Qty, Cost)
+        column = pd.Series(np.where(codes >= 0, values[col].take(codes), np.nan), index=df.index)
+        numeric = pd.to_numeric(column, errors='coerce')
+        joined[col] = numeric if numeric.notna().sum() == column.notna().sum() else column
+
+    rows_matched = (codes >= 0) & found.take(codes)
+    report = {
+        'keys': keys,
+        'rows': len(df),
+        'rows_matched': int(rows_matched.sum()),
+        'rows_unmatched': int((~rows_matched).sum()),
+        'unmatched_main_keys': df.loc[~rows_matched, keys].drop_duplicates().head(UNMATCHED_SAMPLE).to_dict('records'),
+        'supplementary_rows': supplementary_rows,
+        'supplementary_unmatched': unmatched_count,
+        'unmatched_supplementary_keys': unmatched_sample,
+    }
+    return joined, report
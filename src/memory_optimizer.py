@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from categoricals import CATEGORY_RATIO
+
+# Integers are never narrowed below this many bytes, so Qty * Cost style arithmetic
+# on the optimized frame cannot overflow
+MIN_INT_BYTES = 4
+
+
+def _downcast_integer(series):
+    if series.min() >= 0:
+        downcast = pd.to_numeric(series, downcast='unsigned')
+    else:
+        downcast = pd.to_numeric(series, downcast='integer')
+    if downcast.dtype.itemsize < MIN_INT_BYTES:
+        kind = 'uint' if downcast.dtype.kind == 'u' else 'int'
+        downcast = downcast.astype(f'{kind}{MIN_INT_BYTES * 8}')
+    return downcast
+
+
+def _downcast_float(series, lossy_floats):
+    downcast = series.astype('float32')
+    if lossy_floats:
+        return downcast
+    # Keep float64 unless every value survives the round trip exactly
+    if np.array_equal(downcast.to_numpy(dtype='float64'), series.to_numpy(), equal_nan=True):
+        return downcast
+    return series
+
+
+def optimize_memory(df, lossy_floats=False, category_ratio=CATEGORY_RATIO):
+    """
+    Downcasts numeric columns and converts repeated strings to categoricals (dictionary
+    encoding). Returns the optimized frame and a per-column report of bytes before and after.
+    Floats only go to float32 when that is lossless, unless lossy_floats is set.
+    """
+    optimized = {}
+    rows = []
+    for col in df.columns:
+        series = df[col]
+        before = int(series.memory_usage(index=False, deep=True))
+
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            new = series
+        elif series.dtype.kind in 'iu' and len(series):
+            new = _downcast_integer(series)
+        elif series.dtype.kind == 'f':
+            new = _downcast_float(series, lossy_floats)
+        elif series.dtype == object and series.nunique() <= category_ratio * len(series):
+            new = series.astype('category')
+        else:
+            new = series
+
+        optimized[col] = new
+        after = int(new.memory_usage(index=False, deep=True))
+        rows.append({
+            'Column': col,
+            'Type Before': str(series.dtype),
+            'Type After': str(new.dtype),
+            'Bytes Before': before,
+            'Bytes After': after,
+            'Saved %': round(100 * (before - after) / before, 1) if before else 0.0,
+        })
+
+    report = pd.DataFrame(rows).set_index('Column')
+    return pd.DataFrame(optimized, index=df.index), report
+
+
+def summarize_report(report):
+    """
+    One-line total for the report, in megabytes.
+    """
+    before = report['Bytes Before'].sum() / (1024 * 1024)
+    after = report['Bytes After'].sum() / (1024 * 1024)
+    saved = 100 * (before - after) / before if before else 0
+    return f"Memory: {before:,.1f} MB -> {after:,.1f} MB ({saved:.1f}% saved)"
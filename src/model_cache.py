@@ -0,0 +1,172 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX, SARIMAXResults
+
+from data_cache import dataset_cache
+
+# Directory holding one pickled SARIMAX fit per (series fingerprint, model spec)
+MODEL_DIR = os.environ.get(
+    "SALES_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".model_cache"))
+
+# An incrementally updated model is re-estimated from scratch after this many new periods
+REFIT_EVERY = int(os.environ.get("SALES_REFIT_EVERY", "12"))
+
+# ... or as soon as a new observation's standardized one-step forecast error exceeds this
+DRIFT_Z = 3.5
+
+
+def series_fingerprint(series):
+    """
+    Hash of a preprocessed series: its index, values and frequency.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(pd.util.hash_pandas_object(series, index=True).to_numpy().tobytes())
+    digest.update(str(getattr(series.index, 'freqstr', None)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def model_spec(order, seasonal_order, **fit_kwargs):
+    return f"{tuple(order)}|{tuple(seasonal_order)}|{sorted(fit_kwargs.items())}"
+
+
+def model_key(series, order, seasonal_order, **fit_kwargs):
+    """
+    Cache key for a fit: the data fingerprint plus the full model specification.
+    """
+    spec = model_spec(order, seasonal_order, **fit_kwargs)
+    return hashlib.blake2b(f"{series_fingerprint(series)}|{spec}".encode('utf-8'), digest_size=20).hexdigest()
+
+
+def model_path(key):
+    return os.path.join(MODEL_DIR, f"{key}.pkl")
+
+
+def _atomic_write(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=MODEL_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_results(results, key, metadata=None):
+    """
+    Pickles fitted results next to the other cached models, renaming into place so a
+    concurrent reader never loads a half-written file. The metadata sidecar (series length,
+    start, spec) is what lets a longer series find this fit and extend it.
+    """
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    _atomic_write(model_path(key), results.save)
+    if metadata is not None:
+        def write_metadata(path):
+            with open(path, 'w') as f:
+                json.dump(metadata, f)
+        _atomic_write(os.path.join(MODEL_DIR, f"{key}.json"), write_metadata)
+
+
+def _metadata(series, spec, periods_since_fit):
+    return {
+        'spec': spec,
+        'fingerprint': series_fingerprint(series),
+        'length': len(series),
+        'start': str(series.index[0]),
+        'periods_since_fit': periods_since_fit,
+    }
+
+
+def find_base_fit(series, spec):
+    """
+    Finds the stored fit (same spec) whose series is the longest strict prefix of this one.
+    Returns (key, metadata) or (None, None). Only prefixes are hashed, and only for stored
+    fits with a matching start date and spec.
+    """
+    best_key, best = None, None
+    start = str(series.index[0])
+    for path in glob.glob(os.path.join(MODEL_DIR, '*.json')):
+        try:
+            with open(path) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if (metadata.get('spec') != spec or metadata.get('start') != start
+                or not 0 < metadata.get('length', 0) < len(series)
+                or (best is not None and metadata['length'] <= best['length'])):
+            continue
+        if series_fingerprint(series.iloc[:metadata['length']]) == metadata['fingerprint']:
+            best_key, best = os.path.basename(path)[:-len('.json')], metadata
+    return best_key, best
+
+
+def _load(key):
+    results = dataset_cache.get(key, 'sarimax')
+    if results is None and os.path.exists(model_path(key)):
+        try:
+            results = SARIMAXResults.load(model_path(key))
+        except Exception:
+            results = None
+    return results
+
+
+def update_results(results, new_observations):
+    """
+    Extends fitted results with new observations, keeping the estimated parameters and only
+    running the Kalman filter over the added periods. Returns (results, drift): drift is True
+    when a new observation falls far outside the model's one-step forecast.
+    """
+    updated = results.append(new_observations, refit=False)
+    errors = np.asarray(updated.standardized_forecasts_error)[0, -len(new_observations):]
+    drift = bool(np.any(np.abs(errors[np.isfinite(errors)]) > DRIFT_Z))
+    return updated, drift
+
+
+def load_or_fit(series, order=(2, 1, 2), seasonal_order=(1, 1, 1, 12), incremental=True, **fit_kwargs):
+    """
+    Returns fitted SARIMAX results for the series and spec, and where they came from:
+    'memory' (this process), 'disk' (an earlier session), 'update' (a stored fit of an
+    earlier part of this series, extended with the new periods), 'refit' (an update was
+    possible but drift or the REFIT_EVERY schedule forced re-estimation) or 'fit'.
+    Changing only the forecast horizon therefore never refits.
+    """
+    key = model_key(series, order, seasonal_order, **fit_kwargs)
+    results = dataset_cache.get(key, 'sarimax')
+    if results is not None:
+        return results, 'memory'
+
+    spec = model_spec(order, seasonal_order, **fit_kwargs)
+    results = _load(key)
+    source = 'disk'
+    periods_since_fit = 0
+    if results is None and incremental and os.path.isdir(MODEL_DIR):
+        base_key, base = find_base_fit(series, spec)
+        base_results = _load(base_key) if base_key else None
+        if base_results is not None:
+            new_observations = series.iloc[base['length']:]
+            periods_since_fit = base.get('periods_since_fit', 0) + len(new_observations)
+            try:
+                results, drift = update_results(base_results, new_observations)
+            except Exception:
+                # e.g. an index the state space model cannot extend; fall back to a full fit
+                results, drift = None, True
+            if drift or periods_since_fit >= REFIT_EVERY:
+                results, source = None, 'refit'
+            else:
+                source = 'update'
+    if results is None:
+        fit_kwargs.setdefault('disp', False)
+        results = SARIMAX(series, order=order, seasonal_order=seasonal_order).fit(**fit_kwargs)
+        source = 'fit' if source == 'disk' else source
+        periods_since_fit = 0
+    if source != 'disk':
+        save_results(results, key, _metadata(series, spec, periods_since_fit))
+
+    dataset_cache.put(key, 'sarimax', results)
+    return results, source
@@ -0,0 +1,152 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+from columnar_store import is_stored, to_columnar_types, write_dataset
+from data_cache import dataset_key, uploaded_file_key
+
+# Files parsed at once; pyarrow's reader releases the GIL, so threads parse in parallel
+INGEST_THREADS = int(os.environ.get("SALES_INGEST_THREADS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+# Column added to a combined dataset naming the file each row came from
+SOURCE_COLUMN = 'Source File'
+
+
+def read_csv_table(data):
+    """
+    Parses CSV bytes into an Arrow table with pyarrow's multithreaded reader. The bytes are
+    parsed as UTF-8 and only parsed again as Latin-1 if pyarrow finds invalid UTF-8, so a UTF-8
+    file is never decoded twice. A column whose later rows do not fit the type inferred
+    from the first block is read as text instead; to_columnar_types retypes it afterwards.
+    """
+    # Empty text fields are missing values, as in pandas
+    convert_options = pv.ConvertOptions(strings_can_be_null=True)
+    names = None
+    for encoding in ('utf8', 'latin1'):
+        read_options = pv.ReadOptions(encoding=encoding)
+        try:
+            table = pv.read_csv(io.BytesIO(data), read_options=read_options, convert_options=convert_options)
+        except pa.ArrowInvalid:
+            if names is None:
+                names = pd.read_csv(io.BytesIO(data), encoding='latin1', nrows=0).columns
+            text_options = pv.ConvertOptions(strings_can_be_null=True,
+                                             column_types={name: pa.string() for name in names})
+            try:
+                table = pv.read_csv(io.BytesIO(data), read_options=read_options, convert_options=text_options)
+            except pa.ArrowInvalid:
+                # Text that is not valid UTF-8; every byte is valid Latin-1
+                if encoding == 'latin1':
+                    raise
+                continue
+        # pyarrow infers text that is not valid UTF-8 as binary
+        if encoding == 'utf8' and any(pa.types.is_binary(field.type) for field in table.schema):
+            continue
+        return table
+
+
+def reconcile_schemas(schemas):
+    """
+    One schema covering every file: columns in the order they are first seen, a column's
+    type kept where the files agree, numbers of different widths widened to float64, dates
+    of different units to timestamp[ns] and anything else mixed read as text.
+    """
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            if not pa.types.is_null(field.type):
+                types.setdefault(field.name, set()).add(field.type)
+            else:
+                types.setdefault(field.name, set())
+    fields = []
+    for name, kinds in types.items():
+        if len(kinds) == 1:
+            kind = next(iter(kinds))
+        elif kinds and all(pa.types.is_integer(k) or pa.types.is_floating(k) for k in kinds):
+            kind = pa.float64()
+        elif kinds and all(pa.types.is_timestamp(k) for k in kinds):
+            kind = pa.timestamp('ns')
+        else:
+            kind = pa.string()
+        fields.append(pa.field(name, kind))
+    return pa.schema(fields)
+
+
+def conform(table, schema):
+    """
+    Casts a table to the reconciled schema; columns the file lacks are added as nulls.
+    """
+    columns = []
+    for field in schema:
+        if field.name not in table.column_names:
+            columns.append(pa.nulls(len(table), field.type))
+        elif table[field.name].type != field.type:
+            columns.append(table[field.name].cast(field.type))
+        else:
+            columns.append(table[field.name])
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def combine_csvs(named_data, max_workers=INGEST_THREADS):
+    """
+    Parses [(name, bytes), ...] concurrently, reconciles their schemas and concatenates
+    them into one DataFrame with a SOURCE_COLUMN naming each row's file. The Arrow tables
+    are concatenated without copying their buffers; the only copy is the final conversion
+    to pandas, which frees each Arrow column as it goes.
+    """
+    if not named_data:
+        raise ValueError("No files to combine.")
+    names = []
+    originals = []
+    for name, _ in named_data:
+        # Categories must be distinct, so repeated file names get a counter
+        repeats = originals.count(name)
+        originals.append(name)
+        names.append(name if not repeats else f"{name} ({repeats + 1})")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(named_data)))) as pool:
+        tables = list(pool.map(read_csv_table, [data for _, data in named_data]))
+
+    schema = reconcile_schemas([table.schema for table in tables])
+    dictionary = pa.array(names, type=pa.string())
+    parts = []
+    for index, table in enumerate(tables):
+        table = conform(table, schema)
+        # Every part shares one dictionary, so the source column concatenates as a categorical
+        source = pa.DictionaryArray.from_arrays(pa.array(np.full(len(table), index, dtype=np.int32)), dictionary)
+        parts.append(table.append_column(SOURCE_COLUMN, source))
+    del tables
+    combined = pa.concat_tables(parts)
+    del parts
+    return combined.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def file_summary(df):
+    """
+    Rows per source file and the columns each file did not have (all values missing).
+    """
+    counts = df.groupby(SOURCE_COLUMN, observed=True, sort=False).count()
+    rows = df.groupby(SOURCE_COLUMN, observed=True, sort=False).size()
+    return pd.DataFrame({
+        'Rows': rows,
+        'Missing columns': [', '.join(col for col in counts.columns if counts.at[name, col] == 0)
+                            for name in rows.index],
+    }).rename_axis(SOURCE_COLUMN).reset_index()
+
+
+def ingest_many(uploaded_files):
+    """
+    Combines several uploads (e.g. one CSV per store) into one typed dataset in the columnar
+    store, unless that combination is already stored. Returns its content key, which every
+    page can read like a single upload's.
+    """
+    uploaded_files = sorted(uploaded_files, key=lambda f: f.name)
+    content_key = dataset_key(''.join(f"{f.name}:{uploaded_file_key(f)}|" for f in uploaded_files).encode('utf-8'),
+                              combined=True)
+    if not is_stored(content_key):
+        df = combine_csvs([(f.name, f.getvalue()) for f in uploaded_files])
+        write_dataset(to_columnar_types(df), content_key)
+    return content_key
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Number of set bits in every possible byte, used to count bits in packed bitmaps
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def _popcount(packed):
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(packed).sum())
+    return int(_POPCOUNT[packed].sum(dtype=np.int64))
+
+
+def stratified_sample(df, sample_size, strata_column=None, seed=0):
+    """
+    Draws about sample_size rows, proportionally from every stratum. Without a strata
+    column the strata are contiguous row blocks, so every part of the file is represented.
+    """
+    if sample_size is None or sample_size >= len(df):
+        return df
+    rng = np.random.default_rng(seed)
+    if strata_column is not None:
+        strata = pd.factorize(df[strata_column])[0]
+    else:
+        strata = np.arange(len(df)) * 100 // len(df)
+    # Random keys ranked within each stratum; keep the first share of each
+    keys = rng.random(len(df))
+    rank = pd.Series(keys).groupby(strata).rank(pct=True).to_numpy()
+    return df[rank <= sample_size / len(df)]
+
+
+def nullity_correlation(df, sample_size=None, strata_column=None, seed=0):
+    """
+    Pairwise correlation of missingness between columns, like missingno's heatmap.
+    Each column's null mask is packed into a bitmap (one bit per row) and pair counts come
+    from popcounts of ANDed bitmaps. Columns with no nulls (or only nulls) are skipped.
+
+    Returns (correlation frame, details) where details holds the rows used and, when
+    sampling, the largest 95% error bound of any correlation.
+    """
+    sample = stratified_sample(df, sample_size, strata_column, seed)
+    n = len(sample)
+    null_counts = sample.isnull().sum()
+    columns = [col for col in sample.columns if 0 < null_counts[col] < n]
+
+    bitmaps = [np.packbits(sample[col].isnull().to_numpy()) for col in columns]
+    counts = null_counts[columns].to_numpy(dtype='float64')
+
+    corr = np.full((len(columns), len(columns)), np.nan)
+    for i in range(len(columns)):
+        corr[i, i] = 1.0
+        for j in range(i):
+            both = _popcount(bitmaps[i] & bitmaps[j])
+            denominator = np.sqrt(counts[i] * (n - counts[i]) * counts[j] * (n - counts[j]))
+            corr[i, j] = corr[j, i] = (n * both - counts[i] * counts[j]) / denominator
+
+    details = {'rows_used': n, 'rows_total': len(df), 'columns_skipped': len(df.columns) - len(columns)}
+    if n < len(df) and len(columns) > 1:
+        off_diagonal = corr[~np.eye(len(columns), dtype=bool)]
+        details['error_bound'] = float(np.max(1.96 * (1 - off_diagonal ** 2) / np.sqrt(max(n - 1, 1))))
+    return pd.DataFrame(corr, index=columns, columns=columns), details
+
+
+def nullity_heatmap(corr):
+    """
+    Interactive lower-triangle heatmap of a nullity correlation matrix.
+    """
+    values = corr.to_numpy().copy()
+    values[np.triu_indices_from(values)] = np.nan
+    text = np.where(np.isnan(values), '', np.round(values, 1).astype(str))
+    fig = go.Figure(go.Heatmap(
+        z=values,
+        x=corr.columns,
+        y=corr.index,
+        text=text,
+        texttemplate='%{text}',
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu',
+        hovertemplate='%{y} / %{x}: %{z:.3f}<extra></extra>',
+    ))
+    fig.update_layout(title='Nullity Correlation Heatmap', yaxis=dict(autorange='reversed'))
+    return fig
@@ -0,0 +1,166 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+# Line charts above this many points are downsampled before being sent to the browser
+MAX_LINE_POINTS = int(os.environ.get("SALES_MAX_LINE_POINTS", "5000"))
+
+# Scatter/line traces above this many points are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = int(os.environ.get("SALES_WEBGL_THRESHOLD", "10000"))
+
+# Even WebGL scatters are capped (uniform sample) to keep the JSON payload bounded
+MAX_SCATTER_POINTS = int(os.environ.get("SALES_MAX_SCATTER_POINTS", "200000"))
+
+# Bar charts and histograms with more rows than this are aggregated/binned server-side
+MAX_RAW_BAR_ROWS = 5000
+
+
+def _numeric_axis(values):
+    """
+    Numeric view of an x column for downsampling: datetimes as int64, numbers as float,
+    anything else (text, categories) by row position.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=float)
+    return np.arange(len(values), dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: picks n_out points that preserve the visual shape of the
+    series. x and y are float arrays without NaNs, x in drawing order.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    every = (n - 2) / (n_out - 2)
+    edges = np.floor(np.arange(n_out - 1) * every).astype(np.int64) + 1
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[anchor] - avg_x) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (avg_y - y[anchor]))
+        anchor = start + int(np.argmax(area))
+        selected[i + 1] = anchor
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """
+    Min/max bucketing: keeps the lowest and highest point of each of n_out / 2 buckets,
+    so spikes are never lost.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(np.int64)
+    selected = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            bucket = y[start:end]
+            selected.extend((start + int(np.argmin(bucket)), start + int(np.argmax(bucket))))
+    return np.unique(selected)
+
+
+def downsample(df, x, y_columns, max_points=MAX_LINE_POINTS, method='lttb'):
+    """
+    Reduces df to roughly max_points rows for plotting. With several y columns the union of
+    the points chosen for each column is kept.
+    """
+    if len(df) <= max_points:
+        return df
+    x_values = _numeric_axis(df[x])
+    keep = set()
+    for col in y_columns:
+        y_values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+        valid = np.flatnonzero(~np.isnan(y_values) & ~np.isnan(x_values))
+        if method == 'minmax':
+            chosen = minmax_indices(y_values[valid], max_points)
+        else:
+            chosen = lttb_indices(x_values[valid], y_values[valid], max_points)
+        keep.update(valid[chosen].tolist())
+    return df.iloc[np.sort(np.fromiter(keep, dtype=np.int64, count=len(keep)))]
+
+
+def line_chart(df, x, y, max_points=MAX_LINE_POINTS, method='lttb', **kwargs):
+    y_columns = [y] if isinstance(y, str) else list(y)
+    if not all(pd.api.types.is_numeric_dtype(df[col]) for col in y_columns):
+        # Text values have no shape to preserve; plot them as they are
+        return px.line(df, x=x, y=y, **kwargs), len(df)
+    plot_df = downsample(df, x, y_columns, max_points, method)
+    render_mode = 'webgl' if len(plot_df) > WEBGL_THRESHOLD else 'auto'
+    return px.line(plot_df, x=x, y=y, render_mode=render_mode, **kwargs), len(plot_df)
+
+
+def show_line_chart(df, x, y, key, max_points=MAX_LINE_POINTS, method='lttb', **kwargs):
+    """
+    Renders a shape-preserving downsampled line chart. When the series had to be reduced,
+    a zoom slider re-fetches the selected window from the full data, so narrow windows are
+    drawn at full resolution.
+    """
+    if len(df) > max_points and (pd.api.types.is_datetime64_any_dtype(df[x]) or pd.api.types.is_numeric_dtype(df[x])):
+        lower, upper = df[x].min(), df[x].max()
+        if isinstance(lower, pd.Timestamp):
+            lower, upper = lower.to_pydatetime(), upper.to_pydatetime()
+        if lower < upper:
+            window = st.slider("Zoom range", min_value=lower, max_value=upper, value=(lower, upper), key=key)
+            df = df[(df[x] >= window[0]) & (df[x] <= window[1])]
+    fig, shown = line_chart(df, x, y, max_points, method, **kwargs)
+    st.plotly_chart(fig)
+    if shown < len(df):
+        st.caption(f"Showing {shown:,} of {len(df):,} points ({method.upper()} downsampling); "
+                   "narrow the zoom range to see every point.")
+
+
+def scatter_chart(df, x, y, **kwargs):
+    """
+    Scatter plot that switches to WebGL above WEBGL_THRESHOLD points and samples down to
+    MAX_SCATTER_POINTS beyond that.
+    """
+    if len(df) > MAX_SCATTER_POINTS:
+        df = df.sample(MAX_SCATTER_POINTS, random_state=0)
+    render_mode = 'webgl' if len(df) > WEBGL_THRESHOLD else 'auto'
+    return px.scatter(df, x=x, y=y, render_mode=render_mode, **kwargs)
+
+
+def bar_chart(df, x, y, **kwargs):
+    """
+    Bar chart; large frames are summed per x value first, which draws the same stacked
+    totals without shipping every row to the browser.
+    """
+    if len(df) > MAX_RAW_BAR_ROWS and pd.api.types.is_numeric_dtype(df[y]) and x != y:
+        df = df.groupby(x, observed=True, sort=False)[y].sum().reset_index()
+    return px.bar(df, x=x, y=y, **kwargs)
+
+
+def histogram_chart(df, x, nbins=None, **kwargs):
+    """
+    Histogram; large numeric columns are binned server-side and text columns counted,
+    so only the bin counts are sent to the browser.
+    """
+    if len(df) <= MAX_RAW_BAR_ROWS:
+        return px.histogram(df, x=x, nbins=nbins, **kwargs)
+    values = df[x].dropna()
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        values = values.to_numpy(dtype=float)
+        bins = nbins or min(len(np.histogram_bin_edges(values, bins='auto')) - 1, 200)
+        counts, bin_edges = np.histogram(values, bins=bins)
+        binned = pd.DataFrame({x: (bin_edges[:-1] + bin_edges[1:]) / 2, 'count': counts})
+        fig = px.bar(binned, x=x, y='count', **kwargs)
+        fig.update_traces(width=np.diff(bin_edges))
+    else:
+        binned = values.value_counts(sort=False).rename_axis(x).reset_index(name='count')
+        fig = px.bar(binned, x=x, y='count', **kwargs)
+    fig.update_layout(bargap=0)
+    return fig
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# Moving-average windows, in days of the resampled series
+WINDOWS = (7, 30, 90)
+
+# Span of the exponentially weighted moving average, in days
+EWMA_SPAN = 30
+
+
+def daily_totals(frame, date_column, value_column, freq='D'):
+    """
+    Sums value_column per calendar period. Periods without any rows become 0, so a 7-period
+    window always spans 7 days however sparse the data is.
+    """
+    dated = frame[[date_column, value_column]].dropna(subset=[date_column])
+    return dated.groupby(pd.Grouper(key=date_column, freq=freq))[value_column].sum()
+
+
+def _window_sums(cumulative, window):
+    # Sum of each trailing window as the difference of two cumulative sums; the first
+    # window - 1 positions have no full window
+    sums = np.full(len(cumulative) - 1, np.nan)
+    if window <= len(sums):
+        sums[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+
+def rolling_stats(series, windows=WINDOWS, ewma_span=EWMA_SPAN):
+    """
+    Trailing moving average (MA_<w>) and standard deviation (STD_<w>) for every window plus
+    an exponentially weighted mean (EWMA_<span>) of a regularly spaced series. All windows
+    come from the same two cumulative sums (of values and squared values), so each extra
+    window costs two vectorized subtractions regardless of its length.
+    """
+    values = series.fillna(0).to_numpy(dtype=float)
+    # Centering keeps the differences of large cumulative sums accurate
+    offset = values.mean() if len(values) else 0.0
+    centered = values - offset
+    total = np.concatenate([[0.0], np.cumsum(centered)])
+    squares = np.concatenate([[0.0], np.cumsum(centered ** 2)])
+
+    stats = {}
+    for window in windows:
+        sums = _window_sums(total, window)
+        stats[f'MA_{window}'] = sums / window + offset
+        if window > 1:
+            variance = (_window_sums(squares, window) - sums ** 2 / window) / (window - 1)
+            stats[f'STD_{window}'] = np.sqrt(np.clip(variance, 0, None))
+    result = pd.DataFrame(stats, index=series.index)
+    if ewma_span:
+        result[f'EWMA_{ewma_span}'] = series.fillna(0).ewm(span=ewma_span, adjust=False).mean()
+    return result
+
+
+def sales_trend(frame, date_column, value_column, windows=WINDOWS, ewma_span=EWMA_SPAN, freq='D'):
+    """
+    Daily totals of value_column with their rolling statistics, as a flat frame ready for
+    plotting (date_column, value_column, MA_7, STD_7, ...).
+    """
+    daily = daily_totals(frame, date_column, value_column, freq)
+    return pd.concat([daily, rolling_stats(daily, windows, ewma_span)], axis=1).reset_index()
@@ -0,0 +1,87 @@
+import glob
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Directory holding, per feed (CSV header), one sorted array of row hashes per upload
+HASH_DIR = os.environ.get(
+    "SALES_HASH_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".row_hashes"))
+
+_lock = threading.Lock()
+
+
+def row_hashes(df):
+    """
+    One 64-bit hash per row, computed column by column in vectorized code. Numeric columns
+    are hashed as float so the same row hashes alike whether its column was read as int or
+    float (as the streaming profile does).
+    """
+    numeric = df.select_dtypes(include='number').columns
+    hashable = df.astype({col: 'float64' for col in numeric}) if len(numeric) else df
+    return pd.util.hash_pandas_object(hashable, index=False).to_numpy()
+
+
+def duplicate_mask(hashes):
+    """
+    True for every row whose hash already occurred earlier in the array.
+    """
+    return pd.Series(hashes).duplicated().to_numpy()
+
+
+def _feed_dir(feed):
+    return os.path.join(HASH_DIR, feed)
+
+
+def _stored(feed):
+    # [(upload_key, path), ...] in the order the uploads were remembered; files are named
+    # <sequence>-<upload_key>.npy
+    paths = sorted(glob.glob(os.path.join(_feed_dir(feed), '*-*.npy')))
+    return [(os.path.basename(path)[:-len('.npy')].split('-', 1)[1], path) for path in paths]
+
+
+def remember(hashes, feed, upload_key):
+    """
+    Persists the distinct hashes of one upload of a feed after those of every upload
+    remembered before it, renaming into place so a concurrent reader never loads a
+    half-written array.
+    """
+    os.makedirs(_feed_dir(feed), exist_ok=True)
+    with _lock:
+        stored = _stored(feed)
+        for key, path in stored:
+            if key == upload_key:
+                return path
+        path = os.path.join(_feed_dir(feed), f"{len(stored):08d}-{upload_key}.npy")
+        fd, tmp_path = tempfile.mkstemp(dir=_feed_dir(feed), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.unique(hashes))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
+
+
+def seen_mask(hashes, feed, upload_key=None):
+    """
+    True for every row whose hash was stored by an upload of the feed remembered before
+    this one (all of them for an upload not remembered yet), so re-analyzing an older
+    upload never drops rows that only later uploads contain. Each stored array is
+    memory-mapped and probed with a binary search, so the history is never loaded into
+    memory at once. Returns (mask, number of earlier uploads).
+    """
+    seen = np.zeros(len(hashes), dtype=bool)
+    stored = _stored(feed)
+    keys = [key for key, _ in stored]
+    paths = [path for _, path in stored[:keys.index(upload_key) if upload_key in keys else len(stored)]]
+    for path in paths:
+        stored = np.load(path, mmap_mode='r')
+        if not len(stored):
+            continue
+        positions = np.searchsorted(stored, hashes)
+        seen |= stored[np.minimum(positions, len(stored) - 1)] == hashes
+    return seen, len(paths)
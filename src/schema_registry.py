@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from column_roles import ROLE_COLUMNS, find_column
+
+# Directory holding one JSON schema per distinct CSV header
+SCHEMA_DIR = os.environ.get(
+    "SALES_SCHEMA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".schema_registry"))
+
+# Schemas already loaded in this process, keyed by header fingerprint
+_schemas = {}
+_lock = threading.Lock()
+
+
+def header_fingerprint(columns):
+    """
+    Hash of the column names in file order; feeds that keep their header share it.
+    """
+    return hashlib.blake2b(json.dumps([str(col) for col in columns]).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def schema_path(fingerprint):
+    return os.path.join(SCHEMA_DIR, f"{fingerprint}.json")
+
+
+def load_schema(columns):
+    """
+    The schema registered for this header, or None the first time it is seen.
+    """
+    fingerprint = header_fingerprint(columns)
+    with _lock:
+        schema = _schemas.get(fingerprint)
+    if schema is None and os.path.exists(schema_path(fingerprint)):
+        try:
+            with open(schema_path(fingerprint)) as f:
+                schema = json.load(f)
+        except (OSError, ValueError):
+            # A truncated or hand-edited file only costs one detection pass
+            return None
+        with _lock:
+            _schemas[fingerprint] = schema
+    return schema
+
+
+def save_schema(schema):
+    """
+    Registers a schema in memory and on disk, renaming into place so a concurrent reader
+    never sees a half-written file.
+    """
+    fingerprint = header_fingerprint(schema['columns'])
+    schema = {**schema, 'fingerprint': fingerprint}
+    with _lock:
+        _schemas[fingerprint] = schema
+    os.makedirs(SCHEMA_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=SCHEMA_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(schema, f, indent=2)
+        os.replace(tmp_path, schema_path(fingerprint))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return schema
+
+
+def resolve_roles(columns, roles=ROLE_COLUMNS):
+    """
+    Matches every role against its candidate names: {role: column or None}. This only
+    looks at the column names, so it is not stored with the schema and edits to the
+    candidate lists apply to every header at once.
+    """
+    columns = list(columns.columns if hasattr(columns, 'columns') else columns)
+    return {role: find_column(columns, names) for role, names in roles.items()}
+
+
+def read_options(schema):
+    """
+    read_csv keyword arguments that load a file with this header without any inference:
+    every column with its recorded dtype.
+    """
+    return {'dtype': {col: schema['dtypes'][col] for col in schema['columns']}}
@@ -0,0 +1,300 @@
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from aggregates import rollup
+from columnar_store import read_typed
+from data_cache import dataset_key
+from engine import FORECAST_HORIZON, aggregate_tables, analyze_dataset, clean_dataset, forecast_sales
+from forecasting import pool_context
+
+# Worker processes running analysis jobs; further jobs wait in the queue
+SERVICE_WORKERS = int(os.environ.get("SALES_SERVICE_WORKERS", str(max((os.cpu_count() or 2) - 1, 1))))
+
+# Jobs accepted but not finished yet; beyond this new submissions get 503
+MAX_PENDING_JOBS = int(os.environ.get("SALES_SERVICE_MAX_PENDING", "32"))
+
+# Finished jobs whose results are kept for reuse (oldest dropped first)
+MAX_FINISHED_JOBS = int(os.environ.get("SALES_SERVICE_MAX_FINISHED", "256"))
+
+# Largest accepted upload, in megabytes
+MAX_UPLOAD_MB = int(os.environ.get("SALES_SERVICE_MAX_UPLOAD_MB", "200"))
+
+# Origin allowed to call the service from the browser (the React dev server)
+ALLOWED_ORIGIN = os.environ.get("SALES_SERVICE_ORIGIN", "http://localhost:3000")
+
+JOB_KINDS = ('eda', 'forecast')
+
+
+def _records(frame):
+    # JSON-safe rows: timestamps as ISO strings, NaN as null
+    return json.loads(frame.to_json(orient='records', date_format='iso'))
+
+
+def run_job(kind, data, horizon, job_id, progress):
+    """
+    Runs one job in a worker process and returns its JSON-ready result. A 'start' event is
+    reported as (job_id, event) on the progress queue when a worker picks the job up, then
+    one event per finished stage.
+    """
+    def report(stage, started):
+        progress.put((job_id, {'stage': stage, 'seconds': round(time.perf_counter() - started, 3)}))
+
+    progress.put((job_id, {'stage': 'start'}))
+    start = time.perf_counter()
+    df = read_typed(data)
+    report('load', start)
+
+    start = time.perf_counter()
+    cleaned = clean_dataset(df)
+    report('clean', start)
+
+    start = time.perf_counter()
+    analysis = analyze_dataset(cleaned['df_filled'])
+    report('analyze', start)
+
+    sales_column = analysis['sales_column']
+    if kind == 'eda':
+        return {
+            'rows': len(df),
+            'duplicates_removed': cleaned['duplicates_removed'],
+            'columns': {role: analysis[f'{role}_column'] for role in ('sales', 'quantity', 'region', 'category')},
+            'totals': {name: float(value) for name, value in rollup(analysis['cube']).items()},
+            'aggregates': {name: _records(table) for name, table in aggregate_tables(analysis).items()},
+        }
+
+    if not sales_column or 'Date' not in analysis['frame'].columns:
+        raise ValueError('Dataset must contain a "Date" column and a sales column')
+    start = time.perf_counter()
+    forecast = forecast_sales(analysis['frame'], sales_column, horizon)
+    report('forecast', start)
+    return {'sales_column': sales_column, 'horizon': horizon, 'forecast': _records(forecast)}
+
+
+class JobQueue:
+    """
+    Accepts analysis jobs, runs them on a bounded process pool and keeps their progress and
+    results. A job's id is the hash of the upload and its parameters, so identical requests
+    from different users share one run and its cached result.
+    """
+
+    def __init__(self, workers=SERVICE_WORKERS):
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=pool_context())
+        # Start the workers now, before any server thread exists, so forking never copies
+        # a lock another thread is holding
+        self._executor.submit(int).result()
+        self._jobs = OrderedDict()
+        self._changed = threading.Condition()
+        threading.Thread(target=self._drain_progress, daemon=True).start()
+
+    def submit(self, kind, data, horizon):
+        """
+        Returns (job, cached). Raises OverflowError when too many jobs are pending.
+        """
+        job_id = dataset_key(data, kind=kind, horizon=horizon)
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None and job['status'] != 'failed':
+                self._jobs.move_to_end(job_id)
+                return job, True
+            if sum(other['status'] in ('queued', 'running') for other in self._jobs.values()) >= MAX_PENDING_JOBS:
+                raise OverflowError("Too many jobs are waiting; try again shortly.")
+            job = {'id': job_id, 'kind': kind, 'status': 'queued', 'events': [], 'result': None,
+                   'error': None, 'submitted': time.time(), 'finished': None}
+            self._jobs[job_id] = job
+        try:
+            future = self._executor.submit(run_job, kind, data, horizon, job_id, self._progress)
+        except Exception as e:
+            # e.g. a broken pool: fail the job so it does not count as pending forever
+            with self._changed:
+                job.update(status='failed', error=str(e) or type(e).__name__, finished=time.time())
+                self._evict_finished()
+                self._changed.notify_all()
+            return job, False
+        future.add_done_callback(lambda done: self._finish(job_id, done))
+        return job, False
+
+    def get(self, job_id):
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, seen, timeout):
+        """
+        Blocks until the job has more than `seen` events or has finished, or timeout passes.
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs or len(self._jobs[job_id]['events']) > seen
+                or self._jobs[job_id]['status'] in ('done', 'failed'),
+                timeout)
+            job = self._jobs.get(job_id)
+            if job is None:
+                # Evicted while the client was listening
+                return [], 'failed'
+            return list(job['events'][seen:]), job['status']
+
+    def _drain_progress(self):
+        while True:
+            job_id, event = self._progress.get()
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    if job['status'] == 'queued':
+                        job['status'] = 'running'
+                    job['events'].append(event)
+                    self._changed.notify_all()
+
+    def _finish(self, job_id, future):
+        with self._changed:
+            job = self._jobs[job_id]
+            try:
+                job['result'] = future.result()
+                job['status'] = 'done'
+            except Exception as e:
+                job['error'] = str(e) or type(e).__name__
+                job['status'] = 'failed'
+            job['finished'] = time.time()
+            self._evict_finished()
+            self._changed.notify_all()
+
+    def _evict_finished(self):
+        # Keeps the MAX_FINISHED_JOBS most recent finished jobs; called with the lock held
+        finished = [key for key, value in self._jobs.items() if value['status'] in ('done', 'failed')]
+        for key in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[key]
+
+
+def _job_status(job):
+    return {key: job[key] for key in ('id', 'kind', 'status', 'events', 'error', 'submitted', 'finished')}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs?kind=eda|forecast&horizon=N   body: the raw CSV  -> 202 {"id", "status", "cached"}
+    GET  /jobs/<id>                          job status and progress events
+    GET  /jobs/<id>/events                   progress as a Server-Sent Events stream
+    GET  /jobs/<id>/result                   the result (409 until the job is done)
+    """
+    queue = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self._cors_headers()
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _cors_headers(self):
+        self.send_header('Access-Control-Allow-Origin', ALLOWED_ORIGIN)
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._cors_headers()
+        self.end_headers()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/jobs':
+            return self._send_json(404, {'error': 'not found'})
+        query = parse_qs(url.query)
+        kind = query.get('kind', ['eda'])[0]
+        if kind not in JOB_KINDS:
+            return self._send_json(400, {'error': f"kind must be one of {', '.join(JOB_KINDS)}"})
+        try:
+            horizon = int(query.get('horizon', [FORECAST_HORIZON])[0])
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            return self._send_json(400, {'error': 'horizon and Content-Length must be integers'})
+        if horizon < 1:
+            return self._send_json(400, {'error': 'horizon must be at least 1'})
+        if not 0 < length <= MAX_UPLOAD_MB * 1024 * 1024:
+            return self._send_json(413 if length else 400, {'error': f'upload a CSV body of at most {MAX_UPLOAD_MB} MB'})
+
+        data = self.rfile.read(length)
+        try:
+            job, cached = self.queue.submit(kind, data, horizon if kind == 'forecast' else None)
+        except OverflowError as e:
+            return self._send_json(503, {'error': str(e)})
+        if job['status'] == 'failed':
+            return self._send_json(500, {'id': job['id'], 'status': job['status'], 'error': job['error']})
+        self._send_json(200 if job['status'] == 'done' else 202,
+                        {'id': job['id'], 'status': job['status'], 'cached': cached})
+
+    def do_GET(self):
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if len(parts) < 2 or parts[0] != 'jobs' or len(parts) > 3:
+            return self._send_json(404, {'error': 'not found'})
+        job = self.queue.get(parts[1])
+        if job is None:
+            return self._send_json(404, {'error': 'unknown job'})
+
+        if len(parts) == 2:
+            return self._send_json(200, _job_status(job))
+        if parts[2] == 'result':
+            if job['status'] == 'failed':
+                return self._send_json(500, {'error': job['error']})
+            if job['status'] != 'done':
+                return self._send_json(409, {'error': f"job is {job['status']}"})
+            return self._send_json(200, job['result'])
+        if parts[2] == 'events':
+            return self._stream_events(job['id'])
+        self._send_json(404, {'error': 'not found'})
+
+    def _stream_events(self, job_id):
+        self.send_response(200)
+        self._cors_headers()
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        seen = 0
+        try:
+            while True:
+                events, status = self.queue.wait(job_id, seen, timeout=15)
+                for event in events:
+                    self.wfile.write(f"event: progress\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+                seen += len(events)
+                if status in ('done', 'failed'):
+                    self.wfile.write(f"event: {status}\ndata: {json.dumps({'status': status})}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    return
+                if not events:
+                    # Comment line keeps proxies from closing an idle stream
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service running EDA and forecast jobs.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=SERVICE_WORKERS, help="worker processes")
+    args = parser.parse_args(argv)
+
+    ServiceHandler.queue = JobQueue(args.workers)
+    server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregates import build_cube, merge_cubes, rollup
+from date_parsing import parse_dates
+from row_hashes import duplicate_mask
+
+# Rows parsed per chunk; peak memory is proportional to this, not to the file size
+DEFAULT_CHUNKSIZE = int(os.environ.get("SALES_CHUNKSIZE", "200000"))
+
+# Size of the uniform sample kept per numeric column for approximate medians
+MEDIAN_SAMPLE_SIZE = 100000
+
+# Distinct row hashes kept for duplicate detection (8 bytes each); rows after the cap is
+# reached are only checked against the hashes already kept
+MAX_TRACKED_HASHES = int(os.environ.get("SALES_MAX_TRACKED_HASHES", "10000000"))
+
+# Values counted per text column for its mode; beyond this the counts become a heavy-hitter
+# summary that still finds any value making up more than 1/MODE_SKETCH_SIZE of the rows
+MODE_SKETCH_SIZE = 10000
+
+
+def _open(source):
+    """
+    Accepts a path, raw bytes or a file-like object and returns something read_csv can consume.
+    A file-like object (e.g. a Streamlit upload) is rewound and read in place, not copied.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    if hasattr(source, "read") and hasattr(source, "seek"):
+        source.seek(0)
+        return source
+    if hasattr(source, "getvalue"):
+        return io.BytesIO(source.getvalue())
+    return source
+
+
+def read_header(source, encoding='latin1', nrows=0):
+    """
+    Reads only the header (plus nrows data rows) so columns can be detected without a full parse.
+    """
+    return pd.read_csv(_open(source), encoding=encoding, nrows=nrows)
+
+
+def iter_chunks(source, chunksize=DEFAULT_CHUNKSIZE, encoding='latin1', **read_kwargs):
+    """
+    Yields DataFrames of at most chunksize rows.
+    """
+    with pd.read_csv(_open(source), encoding=encoding, chunksize=chunksize, **read_kwargs) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _add(total, part):
+    # Sum two partial aggregates, aligning on their index
+    if total is None:
+        return part
+    return total.add(part, fill_value=0)
+
+
+def _merge_counts(total, counts, capacity):
+    # Misra-Gries merge: add the counts, then keep the capacity most frequent values, less
+    # the count of the first one dropped. Returns (counts, whether anything was dropped).
+    merged = _add(total, counts)
+    if len(merged) <= capacity:
+        return merged, False
+    merged = merged.nlargest(capacity + 1)
+    merged = merged.iloc[:capacity] - merged.iloc[capacity]
+    return merged[merged > 0], True
+
+
+def _clean_numeric(series):
+    if series.dtype == object:
+        series = series.replace({',': ''}, regex=True)
+    return pd.to_numeric(series, errors='coerce')
+
+
+def profile_csv(source, date_column=None, value_columns=(), group_columns=(), encoding='latin1',
+                chunksize=DEFAULT_CHUNKSIZE, exact_medians=False, normalize_text=False,
+                fill_missing_groups=True, prepare_chunk=None, drop_duplicates=True, seed=0):
+    """
+    Streams a CSV in bounded chunks and computes everything the EDA pages need incrementally:
+    missing-value counts, medians (exact or sampled), modes, duplicate counts and a cube of
+    value_columns summed by date_column x group_columns, merged chunk by chunk.
+
+    With fill_missing_groups, rows whose group value is missing are credited to the column's
+    mode, as the in-memory cleaning does. prepare_chunk, if given, is applied to every chunk
+    after numeric/date cleaning and may add derived value columns (e.g. Profit). With
+    drop_duplicates, a row whose hash was already seen is left out of the cube.
+
+    Memory is bounded apart from the chunk: duplicates are tracked in a sorted array of at
+    most MAX_TRACKED_HASHES distinct hashes, and modes come from a summary of at most
+    MODE_SKETCH_SIZE values per text column. Past either cap the result says so
+    ('duplicates_exact', 'approximate_modes'). Exact medians count every distinct value and
+    grow with the number of distinct numbers.
+    """
+    rng = np.random.default_rng(seed)
+    value_columns = [c for c in value_columns if c]
+    group_columns = [c for c in group_columns if c]
+
+    rows = 0
+    missing = None
+    numeric_columns = None
+    value_counts = {}       # exact value counts for exact medians
+    mode_counts = {}        # bounded value counts for text columns (modes)
+    approximate_modes = set()
+    samples = {}            # value samples indexed by random priority, for approximate medians
+    seen_hashes = np.empty(0, dtype=np.uint64)
+    duplicates = 0
+    duplicates_exact = True
+    cube = None
+    head = None
+    dtypes = None
+
+    for chunk in iter_chunks(source, chunksize=chunksize, encoding=encoding):
+        if head is None:
+            head = chunk.head()
+            dtypes = chunk.dtypes
+            numeric_columns = list(chunk.select_dtypes(include='number').columns)
+        rows += len(chunk)
+        missing = _add(missing, chunk.isnull().sum())
+        # Hash numeric columns as float so an int chunk and a float chunk (NaNs elsewhere) agree
+        # (a later chunk may read such a column as text; unparsable values hash as missing)
+        hashable = chunk.copy()
+        for col in numeric_columns:
+            hashable[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+        hashes = pd.util.hash_pandas_object(hashable, index=False).to_numpy()
+        duplicated = duplicate_mask(hashes)
+        if len(seen_hashes):
+            positions = np.minimum(np.searchsorted(seen_hashes, hashes), len(seen_hashes) - 1)
+            duplicated |= seen_hashes[positions] == hashes
+        duplicates += int(duplicated.sum())
+        new_hashes = np.unique(hashes[~duplicated])
+        if len(seen_hashes) + len(new_hashes) > MAX_TRACKED_HASHES:
+            new_hashes = new_hashes[:max(0, MAX_TRACKED_HASHES - len(seen_hashes))]
+            duplicates_exact = False
+        seen_hashes = np.insert(seen_hashes, np.searchsorted(seen_hashes, new_hashes), new_hashes)
+
+        # Medians for numeric columns, modes for text columns
+        for col in chunk.columns:
+            values = chunk[col].dropna()
+            if col in numeric_columns:
+                values = pd.to_numeric(values, errors='coerce').dropna()
+            if col in numeric_columns and not exact_medians:
+                # Keep the values with the smallest random priorities: a uniform sample of every row seen
+                sampled = pd.Series(values.to_numpy(dtype=float), index=rng.random(len(values)))
+                if col in samples:
+                    sampled = pd.concat([samples[col], sampled])
+                samples[col] = sampled.sort_index().iloc[:MEDIAN_SAMPLE_SIZE]
+            elif col in numeric_columns:
+                value_counts[col] = _add(value_counts.get(col), values.value_counts())
+            else:
+                mode_counts[col], truncated = _merge_counts(mode_counts.get(col), values.value_counts(), MODE_SKETCH_SIZE)
+                if truncated:
+                    approximate_modes.add(col)
+
+        # Aggregations of the value columns
+        work = chunk[~duplicated] if drop_duplicates else chunk
+        if value_columns or prepare_chunk:
+            work = work.copy()
+            for col in value_columns:
+                if col in work.columns:
+                    work[col] = _clean_numeric(work[col])
+            if normalize_text:
+                for col in group_columns:
+                    work[col] = work[col].str.lower().str.strip() if work[col].dtype == object else work[col]
+            if date_column:
+                work[date_column] = parse_dates(work[date_column], date_column)
+                work = work.dropna(subset=[date_column])
+            if prepare_chunk is not None:
+                work = prepare_chunk(work)
+        present = [c for c in value_columns if c in work.columns]
+        if present:
+            cube = merge_cubes(cube, build_cube(work, [date_column, *group_columns], {c: c for c in present}))
+
+    if head is None:
+        raise ValueError("The uploaded file does not contain any rows.")
+
+    medians = {}
+    modes = {}
+    for col in numeric_columns:
+        if col in samples:
+            medians[col] = samples[col].median()
+        elif col in value_counts and len(value_counts[col]):
+            counts = value_counts[col].sort_index()
+            cumulative = counts.cumsum()
+            total = cumulative.iloc[-1]
+            lower = counts.index[cumulative.searchsorted((total + 1) // 2)]
+            upper = counts.index[cumulative.searchsorted(total // 2 + 1)]
+            medians[col] = (lower + upper) / 2
+    for col, counts in mode_counts.items():
+        if len(counts):
+            modes[col] = counts.idxmax()
+
+    sums_by_group = {}
+    for col in group_columns:
+        if cube is None:
+            sums_by_group[col] = None
+            continue
+        sums = rollup(cube, col, dropna=False).set_index(col)
+        if sums.index.hasnans:
+            missing_sums = sums[sums.index.isna()].sum()
+            sums = sums[sums.index.notna()]
+            if fill_missing_groups and col in modes:
+                mode = modes[col]
+                if normalize_text and isinstance(mode, str):
+                    mode = mode.lower().strip()
+                sums = _add(sums, missing_sums.to_frame(mode).T)
+            sums.index.name = col
+        sums_by_group[col] = sums.reset_index()
+
+    return {
+        'rows': rows,
+        'head': head,
+        'dtypes': dtypes,
+        'missing': missing.astype(int),
+        'medians': medians,
+        'modes': modes,
+        'median_method': 'exact' if exact_medians else f'sampled ({MEDIAN_SAMPLE_SIZE:,} values)',
+        'duplicates': duplicates,
+        'duplicates_after': 0 if drop_duplicates and duplicates_exact else None,
+        'duplicates_exact': duplicates_exact,
+        'approximate_modes': sorted(approximate_modes),
+        'cube': cube,
+        'totals': rollup(cube) if cube is not None else None,
+        'sums_by_date': rollup(cube, date_column) if cube is not None and date_column else None,
+        'sums_by_group': sums_by_group,
+    }
+
+
+def replacement_values(profile):
+    """
+    Values the in-memory cleaning would have used to fill each column that has missing values.
+    """
+    replacements = {}
+    for col, count in profile['missing'].items():
+        if count == 0:
+            continue
+        if col in profile['medians']:
+            replacements[col] = profile['medians'][col]
+        elif col in profile['modes']:
+            replacements[col] = profile['modes'][col]
+    return replacements
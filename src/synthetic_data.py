@@ -0,0 +1,94 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Rows generated (and written) at a time, so 10^8-row files never sit in memory
+CHUNK_ROWS = 1_000_000
+
+STATES = ["MAHARASHTRA", "KARNATAKA", "TAMIL NADU", "TELANGANA", "UTTAR PRADESH", "DELHI", "KERALA",
+          "WEST BENGAL", "GUJARAT", "RAJASTHAN", "ANDHRA PRADESH", "HARYANA", "MADHYA PRADESH", "PUNJAB"]
+CATEGORIES = ["Set", "Kurta", "Western Dress", "Top", "Ethnic Dress", "Blouse", "Bottom", "Saree", "Dupatta"]
+
+
+def _labels(known, count, prefix):
+    # Real-looking names first, numbered ones once the requested cardinality exceeds them
+    return (known + [f"{prefix} {i}" for i in range(len(known), count)])[:count]
+
+
+def generate_chunk(rows, rng, first_id=0, null_rate=0.05, duplicate_rate=0.02, categories=9, regions=14,
+                   days=1461, start='2019-01-01'):
+    """
+    One block of synthetic orders with the column names the pages detect (Date, Category,
+    ship_state, Qty, Amount, Sales, Cost). Sales follow a yearly season and a weekly cycle,
+    Category and region popularity is skewed, and null_rate of the Category, ship_state,
+    Qty and Cost values are missing. duplicate_rate of the rows are exact copies of others.
+    """
+    unique_rows = rows - int(rows * duplicate_rate)
+    dates = pd.date_range(start, periods=days, freq='D')
+    day = rng.integers(0, days, unique_rows)
+    season = 1 + 0.3 * np.sin(2 * np.pi * dates.dayofyear.to_numpy()[day] / 365.25) \
+        + 0.1 * (dates.dayofweek.to_numpy()[day] >= 5)
+
+    # Zipf-like popularity: a few categories/regions carry most orders
+    category_weights = 1 / np.arange(1, categories + 1)
+    region_weights = 1 / np.arange(1, regions + 1)
+    qty = rng.integers(1, 6, unique_rows).astype(float)
+    unit_price = rng.gamma(4, 120, unique_rows)
+    amount = (qty * unit_price * season).round(2)
+
+    df = pd.DataFrame({
+        'Order_ID': np.arange(first_id, first_id + unique_rows),
+        'Date': pd.Series(dates.strftime('%m/%d/%Y')).to_numpy()[day],
+        'Category': np.array(_labels(CATEGORIES, categories, 'Category'), dtype=object)[
+            rng.choice(categories, unique_rows, p=category_weights / category_weights.sum())],
+        'ship_state': np.array(_labels(STATES, regions, 'Region'), dtype=object)[
+            rng.choice(regions, unique_rows, p=region_weights / region_weights.sum())],
+        'Qty': qty,
+        'Amount': amount,
+        'Sales': amount,
+        'Cost': (unit_price * rng.uniform(0.4, 0.8, unique_rows)).round(2),
+    })
+    for col in ['Category', 'ship_state', 'Qty', 'Cost']:
+        df.loc[rng.random(unique_rows) < null_rate, col] = np.nan
+
+    if rows > unique_rows:
+        duplicates = df.iloc[rng.integers(0, unique_rows, rows - unique_rows)]
+        df = pd.concat([df, duplicates], ignore_index=True)
+    return df
+
+
+def write_sales_csv(path, rows, seed=0, chunk_rows=CHUNK_ROWS, **options):
+    """
+    Writes a synthetic sales CSV of `rows` rows in chunks. The same seed and options always
+    produce the same file. Options are passed to generate_chunk.
+    """
+    written = 0
+    with open(path, 'w', newline='') as f:
+        while written < rows:
+            size = min(chunk_rows, rows - written)
+            # Seeded per chunk, so any chunk can be regenerated on its own
+            rng = np.random.default_rng([seed, written // chunk_rows])
+            generate_chunk(size, rng, first_id=written, **options).to_csv(f, index=False, header=written == 0)
+            written += size
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic sales CSV.")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=float, default=1e5, help="rows to write, e.g. 1e6")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--null-rate', type=float, default=0.05)
+    parser.add_argument('--duplicate-rate', type=float, default=0.02)
+    parser.add_argument('--categories', type=int, default=9, help="distinct categories")
+    parser.add_argument('--regions', type=int, default=14, help="distinct ship_state values")
+    parser.add_argument('--days', type=int, default=1461, help="distinct order dates")
+    args = parser.parse_args(argv)
+    write_sales_csv(args.path, int(args.rows), seed=args.seed, null_rate=args.null_rate,
+                    duplicate_rate=args.duplicate_rate, categories=args.categories, regions=args.regions,
+                    days=args.days)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,56 @@
 import streamlit as st
-import pandas as pd
+
+from data_cache import dataset_cache, uploaded_file_key
+from extracts import build_extract, validate_sample, write_extract
+from schema_registry import resolve_roles
+
+# Define required columns based on your dataset's needs
+REQUIRED_COLUMNS = ['Order_ID', 'Date', 'Amount']  # Adjust based on your needs
 
 # Function to validate the dataset and provide the link to the Tableau dashboard
 def visualize_tableau_dashboard(uploaded_file):
-    # Load the dataset
-    df = pd.read_csv(uploaded_file)
-
-    # Define required columns based on your dataset's needs
-    required_columns = {'Order_ID', 'Date', 'Amount'}  # Adjust based on your needs
-    if not required_columns.issubset(df.columns):
-        st.error(f"Uploaded dataset does not have the required columns: {', '.join(required_columns)}")
+    # Only the header and a bounded sample are read to decide whether the file is usable
+    encoding = 'utf-8'
+    try:
+        sample, problems = validate_sample(uploaded_file, REQUIRED_COLUMNS, encoding=encoding)
+    except UnicodeDecodeError:
+        encoding = 'latin1'
+        sample, problems = validate_sample(uploaded_file, REQUIRED_COLUMNS, encoding=encoding)
+    if problems:
+        st.error("Uploaded dataset cannot be used: " + "; ".join(problems))
         return
 
     # Display a success message and show the dataframe (optional)
     st.success("Dataset uploaded successfully!")
-    st.write(df.head())  # Display the first few rows for verification
+    st.write(sample.head())  # Display the first few rows for verification
+
+    # Pre-aggregated, typed extract for the dashboard instead of the raw CSV
+    if st.checkbox("Build a pre-aggregated extract for the dashboard (Parquet)"):
+        roles = resolve_roles(sample.columns)
+        dimensions = ['Date', 'Order_ID', roles['region']]
+        measures = [col for col in ['Amount', roles['quantity'], roles['cost']] if col]
+        dataset_id = uploaded_file_key(uploaded_file)
+
+        def make_extract():
+            try:
+                extract = build_extract(uploaded_file, dimensions, measures, encoding=encoding)
+            except UnicodeDecodeError:
+                # The sample decoded as UTF-8 but a later row does not: read the file as Latin-1
+                extract = build_extract(uploaded_file, dimensions, measures, encoding='latin1')
+            return extract, write_extract(extract, f"tableau_{dataset_id[:16]}")
+
+        # Built and written once per upload; reruns reuse it
+        try:
+            extract, path = dataset_cache.get_or_compute(
+                dataset_id, ('tableau_extract', tuple(dimensions), tuple(measures)), make_extract)
+        except (UnicodeDecodeError, ValueError) as e:
+            st.error(f"The extract could not be built: {e}")
+            return
+        st.write(f"Extract: {len(extract):,} rows grouped by {', '.join(col for col in dimensions if col)} "
+                 f"(written to {path})")
+        st.dataframe(extract.head())
+        with open(path, 'rb') as f:
+            st.download_button("Download extract (Parquet)", f.read(), file_name="tableau_extract.parquet")
 
     # Provide a link to open the Tableau dashboard in a new tab
     tableau_url = "https://public.tableau.com/views/Finalproject1tableau/Dashboard2?:language=en-US&:display_count=n&:origin=viz_share_link"
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The pages import their helpers as top-level modules from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import feeds  # noqa: E402
+import model_cache  # noqa: E402
+import row_hashes  # noqa: E402
+import schema_registry  # noqa: E402
+from synthetic_data import generate_chunk  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    """
+    Points every on-disk store at a fresh temporary directory.
+    """
+    monkeypatch.setattr(row_hashes, 'HASH_DIR', str(tmp_path / 'row_hashes'))
+    monkeypatch.setattr(feeds, 'FEED_DIR', str(tmp_path / 'feeds'))
+    monkeypatch.setattr(schema_registry, 'SCHEMA_DIR', str(tmp_path / 'schema_registry'))
+    monkeypatch.setattr(schema_registry, '_schemas', {})
+    monkeypatch.setattr(model_cache, 'MODEL_DIR', str(tmp_path / 'model_cache'))
+    return tmp_path
+
+
+@pytest.fixture
+def sales_csv():
+    """
+    CSV bytes of 20,000 synthetic orders, 2% of them exact duplicates.
+    """
+    df = generate_chunk(20000, np.random.default_rng(7), null_rate=0.0, days=365)
+    return df.to_csv(index=False).encode('latin1')
+
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from engine import clean_dataset
+
+
+def test_duplicate_counts_as_uploaded():
+    df = pd.DataFrame({'A': [1, 1, 2, 2, 3], 'B': ['x', 'x', 'y', 'y', 'z']})
+    cleaned = clean_dataset(df)
+    assert cleaned['duplicates_before'] == 2
+    assert cleaned['duplicates_after'] == 0
+    assert cleaned['duplicates_removed'] == 2
+    pd.testing.assert_frame_equal(cleaned['df_filled'], df.drop_duplicates())
+
+
+def test_rows_identical_after_filling_are_dropped():
+    # (1, NaN) becomes (1, 5) once the median fills B, duplicating the second row
+    df = pd.DataFrame({'A': [1, 1, 2, 3], 'B': [np.nan, 5, 5, 7]})
+    cleaned = clean_dataset(df)
+    assert cleaned['duplicates_before'] == 0
+    assert cleaned['duplicates_removed'] == 1
+    assert cleaned['duplicates_after'] == 0
+    assert len(cleaned['df_filled']) == 3
+    assert not cleaned['df_filled'].duplicated().any()
+
+
+def test_only_earlier_uploads_count_as_seen():
+    first = pd.DataFrame({'A': [1, 2], 'B': [1.0, 2.0]})
+    second = pd.DataFrame({'A': [2, 3], 'B': [2.0, 3.0]})
+    assert clean_dataset(first, 'feed', 'first')['seen_before'] == 0
+    assert clean_dataset(second, 'feed', 'second')['seen_before'] == 1
+
+    # Re-analyzing the first upload must not drop the row the second one repeated
+    again = clean_dataset(first, 'feed', 'first')
+    assert again['seen_before'] == 0
+    assert again['earlier_uploads'] == 0
+    assert len(again['df_filled']) == 2
+
+    again = clean_dataset(second, 'feed', 'second')
+    assert again['seen_before'] == 1
+    assert again['earlier_uploads'] == 1
@@ -0,0 +1,55 @@
+import io
+
+import pandas as pd
+import pytest
+
+from aggregates import rollup
+from engine import analyze_dataset, clean_dataset
+from feeds import append_rows
+
+
+def test_appends_add_up_to_full_recompute(sales_csv):
+    full = pd.read_csv(io.BytesIO(sales_csv), encoding='latin1')
+    first, second = full.iloc[:12000], full.iloc[12000:].reset_index(drop=True)
+
+    append_rows('feed', 'first', first)
+    cube, state, appended = append_rows('feed', 'second', second)
+    assert appended
+
+    expected = analyze_dataset(clean_dataset(full)['df_filled'])['cube']
+    assert state['rows'] == int(rollup(expected)['Rows'])
+    totals, expected_totals = rollup(cube), rollup(expected)
+    for measure in ['Amount', 'Profit', 'Rows']:
+        assert totals[measure] == pytest.approx(expected_totals[measure])
+
+    by_date = rollup(cube, 'Date').set_index('Date')['Amount']
+    expected_by_date = rollup(expected, 'Date').set_index('Date')['Amount']
+    pd.testing.assert_series_equal(by_date.sort_index(), expected_by_date.sort_index(), check_names=False)
+
+
+def test_repeated_upload_changes_nothing(sales_csv):
+    df = pd.read_csv(io.BytesIO(sales_csv), encoding='latin1')
+    cube, state, _ = append_rows('feed', 'only', df)
+    again, state_again, appended = append_rows('feed', 'only', df)
+    assert not appended
+    assert state_again['rows'] == state['rows']
+    assert len(state_again['uploads']) == 1
+    assert rollup(again)['Amount'] == pytest.approx(rollup(cube)['Amount'])
+
+
+def test_rows_appended_before_are_skipped(sales_csv):
+    df = pd.read_csv(io.BytesIO(sales_csv), encoding='latin1')
+    _, state, _ = append_rows('feed', 'first', df.iloc[:100])
+    # The second upload repeats the first 50 rows
+    _, state, _ = append_rows('feed', 'second', df.iloc[50:200].reset_index(drop=True))
+    assert state['uploads'][1]['already_appended'] == 50
+    assert state['rows'] == len(df.iloc[:200].drop_duplicates())
+
+
+def test_changed_columns_are_rejected(sales_csv):
+    df = pd.read_csv(io.BytesIO(sales_csv), encoding='latin1')
+    append_rows('feed', 'first', df.iloc[:100])
+    with pytest.raises(ValueError, match='columns'):
+        append_rows('feed', 'second', df.iloc[100:200].drop(columns='Cost'))
+    with pytest.raises(ValueError, match='types changed'):
+        append_rows('feed', 'third', df.iloc[100:200].assign(Amount='n/a'))
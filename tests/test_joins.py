@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from joins import join_supplementary
+
+
+def test_matches_by_key_not_position():
+    df = pd.DataFrame({'Order_ID': [3, 1, 2, 1, 9], 'Amount': [30.0, 10.0, 20.0, 11.0, 90.0]})
+    # Shuffled, with leading zeros, one unknown key and a key listed twice (last wins)
+    supplementary = b"Order_ID,Qty,Cost\n002,2,5.5\n001,1,4.0\n003,3,1.0\n007,7,7.0\n002,4,6.5\n"
+    joined, report = join_supplementary(df, supplementary, ['Order_ID'], ['Qty', 'Cost'], chunksize=2)
+
+    assert joined['Qty'].tolist()[:4] == [3, 1, 4, 1]
+    assert joined['Cost'].tolist()[:4] == [1.0, 4.0, 6.5, 4.0]
+    assert pd.isna(joined['Qty'].iloc[4])
+    assert pd.api.types.is_numeric_dtype(joined['Qty'])
+    assert joined['Amount'].tolist() == df['Amount'].tolist()
+
+    assert report['rows_matched'] == 4
+    assert report['rows_unmatched'] == 1
+    assert report['unmatched_main_keys'] == [{'Order_ID': 9}]
+    assert report['supplementary_rows'] == 5
+    assert report['supplementary_unmatched'] == 1
+    assert report['unmatched_supplementary_keys'] == [{'Order_ID': 7}]
+
+
+def test_composite_keys():
+    df = pd.DataFrame({'SKU': ['a', 'a', 'b'], 'Date': pd.to_datetime(['2022-01-01', '2022-01-02', '2022-01-01'])})
+    supplementary = b"SKU,Date,Cost\nb,01/01/2022,3\na,01/02/2022,2\na,01/01/2022,1\n"
+    joined, report = join_supplementary(df, supplementary, ['SKU', 'Date'], ['Cost'])
+    assert joined['Cost'].tolist() == [1, 2, 3]
+    assert report['rows_unmatched'] == 0
+
+
+def test_missing_columns_are_reported():
+    df = pd.DataFrame({'Order_ID': [1]})
+    with pytest.raises(ValueError, match='Cost'):
+        join_supplementary(df, b"Order_ID,Qty\n1,2\n", ['Order_ID'], ['Cost'])
+
+
+def test_missing_keys_never_match():
+    df = pd.DataFrame({'Order_ID': ['A1', None, 'A2'], 'Amount': [1.0, 2.0, 3.0]})
+    supplementary = b"Order_ID,extra\nA1,first\n,MISSINGKEY\nA2,second\n"
+    joined, report = join_supplementary(df, supplementary, ['Order_ID'], ['extra'])
+    assert joined['extra'].iloc[0] == 'first'
+    assert pd.isna(joined['extra'].iloc[1])
+    assert joined['extra'].iloc[2] == 'second'
+    assert report['rows_unmatched'] == 1
+    assert report['supplementary_unmatched'] == 1
+    assert all(pd.isna(key['Order_ID']) for key in report['unmatched_supplementary_keys'])
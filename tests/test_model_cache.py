@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+import model_cache
+
+ORDER = (1, 0, 1)
+SEASONAL_ORDER = (0, 0, 0, 0)
+
+
+def monthly_series(seed, periods=72):
+    rng = np.random.default_rng(seed)
+    values = 10 + 0.1 * np.arange(periods) + np.sin(np.arange(periods) / 2) + rng.normal(0, 0.2, periods)
+    return pd.Series(values, index=pd.date_range('2018-01-31', periods=periods, freq='M'))
+
+
+def test_update_matches_filtering_and_full_refit():
+    series = monthly_series(1)
+    base, source = model_cache.load_or_fit(series.iloc[:-3], ORDER, SEASONAL_ORDER)
+    assert source == 'fit'
+
+    updated, source = model_cache.load_or_fit(series, ORDER, SEASONAL_ORDER)
+    assert source == 'update'
+    # Same parameters, filtered over the whole series
+    np.testing.assert_allclose(updated.params, base.params)
+    filtered = SARIMAX(series, order=ORDER, seasonal_order=SEASONAL_ORDER).filter(base.params)
+    np.testing.assert_allclose(updated.forecast(6), filtered.forecast(6))
+
+    # And close to re-estimating from scratch
+    refit = SARIMAX(series, order=ORDER, seasonal_order=SEASONAL_ORDER).fit(disp=False)
+    np.testing.assert_allclose(updated.forecast(6), refit.forecast(6), rtol=0.02)
+
+
+def test_stored_fit_is_reused():
+    series = monthly_series(2)
+    model_cache.load_or_fit(series, ORDER, SEASONAL_ORDER)
+    model_cache.dataset_cache.clear()
+    _, source = model_cache.load_or_fit(series, ORDER, SEASONAL_ORDER)
+    assert source == 'disk'
+
+
+def test_refit_after_schedule(monkeypatch):
+    monkeypatch.setattr(model_cache, 'REFIT_EVERY', 2)
+    series = monthly_series(3)
+    model_cache.load_or_fit(series.iloc[:-3], ORDER, SEASONAL_ORDER)
+    _, source = model_cache.load_or_fit(series, ORDER, SEASONAL_ORDER)
+    assert source == 'refit'
+
+
+def test_full_fit_without_incremental():
+    series = monthly_series(4)
+    model_cache.load_or_fit(series.iloc[:-3], ORDER, SEASONAL_ORDER)
+    results, source = model_cache.load_or_fit(series, ORDER, SEASONAL_ORDER, incremental=False)
+    assert source == 'fit'
+    assert results.nobs == len(series)
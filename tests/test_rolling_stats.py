@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from rolling_stats import daily_totals, rolling_stats, sales_trend
+
+
+def test_matches_pandas_rolling():
+    rng = np.random.default_rng(3)
+    # Large values stress the cumulative-sum differences
+    series = pd.Series(1e6 + rng.normal(0, 50, 400), index=pd.date_range('2022-01-01', periods=400))
+    stats = rolling_stats(series, windows=(1, 7, 30, 90), ewma_span=30)
+    for window in (1, 7, 30, 90):
+        pd.testing.assert_series_equal(stats[f'MA_{window}'], series.rolling(window).mean(),
+                                       check_names=False, rtol=1e-9)
+    for window in (7, 30, 90):
+        pd.testing.assert_series_equal(stats[f'STD_{window}'], series.rolling(window).std(),
+                                       check_names=False, rtol=1e-6)
+    pd.testing.assert_series_equal(stats['EWMA_30'], series.ewm(span=30, adjust=False).mean(), check_names=False)
+
+
+def test_window_longer_than_series():
+    stats = rolling_stats(pd.Series([1.0, 2.0, 3.0]), windows=(7,), ewma_span=None)
+    assert stats['MA_7'].isna().all()
+
+
+def test_windows_span_calendar_days():
+    frame = pd.DataFrame({'Date': pd.to_datetime(['2022-01-01', '2022-01-01', '2022-01-04']),
+                          'Sales': [1.0, 2.0, 4.0]})
+    daily = daily_totals(frame, 'Date', 'Sales')
+    assert daily.tolist() == [3.0, 0.0, 0.0, 4.0]
+
+    trend = sales_trend(frame, 'Date', 'Sales', windows=(2,), ewma_span=None)
+    assert trend['MA_2'].tolist()[1:] == [1.5, 0.0, 2.0]
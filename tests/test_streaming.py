@@ -0,0 +1,61 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import streaming
+from aggregates import rollup
+from engine import analyze_dataset, clean_dataset
+
+
+def test_streamed_totals_match_in_memory(sales_csv):
+    cleaned = clean_dataset(pd.read_csv(io.BytesIO(sales_csv), encoding='latin1'))
+    analysis = analyze_dataset(cleaned['df_filled'])
+    expected = rollup(analysis['cube'])
+
+    profile = streaming.profile_csv(sales_csv, date_column='Date', value_columns=['Amount', 'Qty'],
+                                    group_columns=['Category', 'ship_state'], chunksize=3000,
+                                    normalize_text=True)
+    assert profile['rows'] == 20000
+    assert profile['duplicates'] == cleaned['duplicates_before'] > 0
+    assert profile['duplicates_after'] == 0
+    assert profile['totals']['Amount'] == pytest.approx(expected['Amount'])
+    assert profile['totals']['Qty'] == pytest.approx(expected['Qty'])
+
+    by_category = profile['sums_by_group']['Category']
+    expected_by_category = rollup(analysis['cube'], 'Category')
+    assert (dict(zip(by_category['Category'].astype(str), by_category['Amount']))
+            == pytest.approx(dict(zip(expected_by_category['Category'].astype(str), expected_by_category['Amount']))))
+
+
+def test_duplicates_can_be_kept(sales_csv):
+    raw = pd.read_csv(io.BytesIO(sales_csv), encoding='latin1')
+    profile = streaming.profile_csv(sales_csv, date_column='Date', value_columns=['Amount'],
+                                    chunksize=3000, drop_duplicates=False)
+    assert profile['totals']['Amount'] == pytest.approx(raw['Amount'].sum())
+
+
+def test_hash_cap_is_reported(sales_csv, monkeypatch):
+    monkeypatch.setattr(streaming, 'MAX_TRACKED_HASHES', 1000)
+    profile = streaming.profile_csv(sales_csv, date_column='Date', value_columns=['Amount'], chunksize=3000)
+    assert not profile['duplicates_exact']
+    assert profile['duplicates_after'] is None
+
+
+def test_mode_summary_keeps_heavy_hitters(monkeypatch):
+    rng = np.random.default_rng(0)
+    # One frequent value among many distinct ones
+    values = np.where(rng.random(20000) < 0.2, 'common', [f"id{i}" for i in range(20000)])
+    data = pd.DataFrame({'Key': values, 'Amount': 1.0}).to_csv(index=False).encode()
+    monkeypatch.setattr(streaming, 'MODE_SKETCH_SIZE', 100)
+    profile = streaming.profile_csv(data, chunksize=2000)
+    assert profile['approximate_modes'] == ['Key']
+    assert profile['modes']['Key'] == 'common'
+
+
+def test_numeric_column_read_as_text_in_a_later_chunk():
+    data = b"Date,Amount\n01/01/2022,1\n01/02/2022,2\n01/03/2022,oops\n01/04/2022,4\n"
+    profile = streaming.profile_csv(data, date_column='Date', value_columns=['Amount'], chunksize=2)
+    assert profile['rows'] == 4
+    assert profile['totals']['Amount'] == pytest.approx(7)